@@ -1,5 +1,5 @@
 # lms_automation/app.py
-from flask import Flask, render_template, render_template_string, request, redirect, url_for, flash, Response
+from flask import Flask, render_template, render_template_string, request, redirect, url_for, flash, Response, stream_with_context
 import os
 from datetime import datetime, date, timedelta  # Import date, timedelta for deadlines
 from itsdangerous import URLSafeSerializer, BadSignature
@@ -7,12 +7,22 @@ import csv
 import requests
 import pytz
 import io
+import re
+import base64
+import hashlib
+import hmac
+import struct
 from dotenv import load_dotenv
-from sqlalchemy import text
+from sqlalchemy import text, func, select, update, bindparam
+from sqlalchemy.orm import selectinload, joinedload, raiseload, contains_eager
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import json
 import subprocess
 import threading
 import sys
+from collections import defaultdict
+from functools import lru_cache
 
 # Load environment variables
 if os.environ.get('FLASK_ENV') == 'production':
@@ -34,9 +44,9 @@ except ImportError:
 
 # Import our API module
 try:
-    from .football_data_api import get_upcoming_premier_league_fixtures, get_premier_league_fixtures_by_season, get_fixture_by_id, get_fixtures_by_ids
+    from .football_data_api import get_upcoming_premier_league_fixtures, get_premier_league_fixtures_by_season, get_fixture_by_id, get_fixtures_by_ids, parse_iso
 except ImportError:
-    from football_data_api import get_upcoming_premier_league_fixtures, get_premier_league_fixtures_by_season, get_fixture_by_id, get_fixtures_by_ids
+    from football_data_api import get_upcoming_premier_league_fixtures, get_premier_league_fixtures_by_season, get_fixture_by_id, get_fixtures_by_ids, parse_iso
 from flask_migrate import Migrate
 
 # --- App Initialization ---
@@ -80,26 +90,58 @@ migrate = Migrate(app, db)
 pick_link_serializer = URLSafeSerializer(app.config['SECRET_KEY'], salt='pick-link')
 my_picks_link_serializer = URLSafeSerializer(app.config['SECRET_KEY'], salt='my-picks-link')
 
+# Pick links carry a fixed (player_id, round_id) payload, so they are packed
+# as two uint32s plus a keyed BLAKE2b MAC instead of JSON + HMAC-SHA1.
+_PICK_LINK_KEY = hashlib.blake2b(b'pick-link' + app.config['SECRET_KEY'].encode(), digest_size=32).digest()
+_PICK_LINK_BODY = struct.Struct('<II')
+_PICK_LINK_MAC_SIZE = 10
+
+def _pick_link_mac(body: bytes) -> bytes:
+    return hashlib.blake2b(body, key=_PICK_LINK_KEY, digest_size=_PICK_LINK_MAC_SIZE).digest()
+
+@lru_cache(maxsize=4096)
 def make_pick_token(player_id: int, round_id: int) -> str:
-    return pick_link_serializer.dumps({'p': int(player_id), 'r': int(round_id)})
+    # Tokens are deterministic for a (player, round) pair, so memoize the MAC work
+    body = _PICK_LINK_BODY.pack(int(player_id), int(round_id))
+    return base64.urlsafe_b64encode(body + _pick_link_mac(body)).rstrip(b'=').decode()
 
 def parse_pick_token(token: str):
+    if '.' in token:
+        # Links sent before the compact format are still itsdangerous tokens
+        try:
+            data = pick_link_serializer.loads(token)
+            return int(data.get('p')), int(data.get('r'))
+        except BadSignature:
+            return None, None
     try:
-        data = pick_link_serializer.loads(token)
-        return int(data.get('p')), int(data.get('r'))
-    except BadSignature:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except (ValueError, TypeError):
+        return None, None
+    if len(raw) != _PICK_LINK_BODY.size + _PICK_LINK_MAC_SIZE:
         return None, None
+    body, mac = raw[:_PICK_LINK_BODY.size], raw[_PICK_LINK_BODY.size:]
+    if not hmac.compare_digest(mac, _pick_link_mac(body)):
+        return None, None
+    return _PICK_LINK_BODY.unpack(body)
+
+# Built once instead of per dumps/loads call; tokens are byte-identical to serializer.dumps
+_my_picks_signer = my_picks_link_serializer.make_signer()
 
+@lru_cache(maxsize=4096)
 def make_my_picks_token(player_id: int) -> str:
-    return my_picks_link_serializer.dumps({'p': int(player_id)})
+    payload = my_picks_link_serializer.dump_payload({'p': int(player_id)})
+    return _my_picks_signer.sign(payload).decode('utf-8')
 
 def parse_my_picks_token(token: str):
     try:
-        data = my_picks_link_serializer.loads(token)
+        data = my_picks_link_serializer.load_payload(_my_picks_signer.unsign(token))
         return int(data.get('p'))
     except BadSignature:
         return None
 
+# Resolved once; deadline formatting runs on page renders
+LONDON_TZ = pytz.timezone('Europe/London')
+
 def compute_round_deadline(round_obj):
     """
     Return a human-readable deadline string for a round:
@@ -107,39 +149,15 @@ def compute_round_deadline(round_obj):
     Falls back to a generic text if fixtures/times unavailable.
     """
     try:
-        # Try relationship first
-        fixtures = list(getattr(round_obj, 'fixtures', []) or [])
-        if not fixtures:
-            try:
-                fixtures = Fixture.query.filter_by(round_id=round_obj.id).all()
-            except Exception:
-                fixtures = []
-
-        if fixtures:
-            london = pytz.timezone('Europe/London')
-            times = []
-            for fx in fixtures:
-                dt = None
-                # If your model stores datetime in `date`
-                if hasattr(fx, 'date') and isinstance(fx.date, datetime):
-                    dt = fx.date
-                # Or if stored as date + time string
-                elif hasattr(fx, 'date') and hasattr(fx, 'time') and fx.date and fx.time:
-                    try:
-                        if isinstance(fx.date, date):
-                            hh, mm = str(fx.time).split(':')[0:2]
-                            dt = datetime.combine(fx.date, datetime.min.time()).replace(hour=int(hh), minute=int(mm))
-                    except Exception:
-                        dt = None
-                if dt:
-                    if dt.tzinfo is None:
-                        dt = london.localize(dt)
-                    else:
-                        dt = dt.astimezone(london)
-                    times.append(dt)
-            if times:
-                deadline = min(times) - timedelta(hours=1)
-                return deadline.strftime('%a %d %b %H:%M')
+        # Earliest kick-off as one indexed aggregate (round_id, date) instead of loading fixtures
+        earliest = db.session.query(func.min(Fixture.date)).filter_by(round_id=round_obj.id).scalar()
+        if earliest:
+            if earliest.tzinfo is None:
+                earliest = LONDON_TZ.localize(earliest)
+            else:
+                earliest = earliest.astimezone(LONDON_TZ)
+            deadline = earliest - timedelta(hours=1)
+            return deadline.strftime('%a %d %b %H:%M')
     except Exception as e:
         app.logger.warning("Could not compute round deadline: %s", e)
     return "1 hour before first kick-off"
@@ -147,8 +165,15 @@ def compute_round_deadline(round_obj):
 # --- Queue-based WhatsApp Configuration ---
 WORKER_API_TOKEN = os.environ.get('WORKER_API_TOKEN')  # Token for worker authentication
 
+# ASCII digits only: \D left other scripts' digits (e.g. Arabic-Indic) in place, so they
+# then passed the length checks and reached the WhatsApp send queue
+_NON_DIGITS = re.compile(r'[^0-9]')
+
 def _digits_only(s: str) -> str:
-    return ''.join(ch for ch in (s or '') if ch.isdigit())
+    # Stored numbers are usually bare digits already; skip the regex for those
+    if s and s.isascii() and s.isdigit():
+        return s
+    return _NON_DIGITS.sub('', s or '')
 
 def to_e164_digits(whatsapp_number: str) -> str:
     """
@@ -191,71 +216,176 @@ def is_valid_phone_number(phone_str: str) -> bool:
     
     return True
 
+def _send_queue_insert():
+    """
+    INSERT for SendQueue rows that skips a message already waiting to go to the same number
+    (uq_send_queue_unsent_message), so enqueue retries can't cause double sends.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return pg_insert(SendQueue.__table__).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite_insert(SendQueue.__table__).on_conflict_do_nothing()
+    return SendQueue.__table__.insert()
+
+# error_msg from queue_whatsapp_message when the same text is already waiting for that number
+ALREADY_QUEUED = 'already queued'
+
 def queue_whatsapp_message(to_digits: str, body_text: str, player_id: int = None):
     """
     Queue a WhatsApp message for sending via the local worker.
-    Returns (ok: bool, error_msg: str|None)
+    Returns (ok: bool, error_msg: str|None); error_msg is ALREADY_QUEUED for a duplicate.
     """
     try:
-        # Add message to the send queue
-        send_item = SendQueue(
-            player_id=player_id,
-            number=to_digits,
-            message=body_text,
-            status='pending'
-        )
-        db.session.add(send_item)
+        # Same Core INSERT the bulk link send uses; no ORM object is needed for a fire-and-forget row
+        result = db.session.execute(_send_queue_insert(), {
+            'player_id': player_id,
+            'number': to_digits,
+            'message': body_text,
+            'status': 'pending',
+        })
         db.session.commit()
+        # The unique index drops a duplicate without an error; a single-row rowcount is reliable
+        if result.rowcount == 0:
+            return False, ALREADY_QUEUED
         return True, None
     except Exception as e:
+        db.session.rollback()
         app.logger.error(f"Failed to queue WhatsApp message: {e}")
         return False, str(e)
 
-def _consecutive_whatsapp_failures(player_id: int, window: int = 10) -> int:
-    """Return number of consecutive failed sends for the given player, looking back up to `window` attempts."""
-    sends = SendQueue.query.filter_by(player_id=player_id, status='failed').order_by(SendQueue.updated_at.desc()).limit(window).all()
-    return len(sends)
+def _recent_failures_subquery(player_id: int, window: int = 10):
+    """Scalar subquery counting failed sends among the player's last `window` queued messages."""
+    recent = (
+        select(SendQueue.status)
+        .where(SendQueue.player_id == player_id)
+        .order_by(SendQueue.id.desc())
+        .limit(window)
+        .subquery()
+    )
+    return select(func.count()).select_from(recent).where(recent.c.status == 'failed').scalar_subquery()
+
+@lru_cache(maxsize=32)
+def _pick_message_template(round_number: int) -> str:
+    """Pick message with the round filled in; a broadcast only substitutes name and link per player."""
+    return (
+        "Hello {name}! It's time to make your pick for LMS Round " + str(round_number) + ".\n"
+        "Click here to make your pick: {link}\n"
+        "(Deadline: 1 hour before first kick-off)"
+    )
 
 def build_pick_message(player_name: str, round_number: int, pick_link: str) -> str:
     
-    return f"Hello {player_name}! It's time to make your pick for LMS Round {round_number}.\nClick here to make your pick: {pick_link}\n(Deadline: 1 hour before first kick-off)"
+    return _pick_message_template(round_number).format(name=player_name, link=pick_link)
 
 # ----------------- Helpers for results & pick outcomes -----------------
 
+@lru_cache(maxsize=4096)
 def normalize_team(name: str):
+    # Team names are a small, repeating set, so most calls are cache hits
     return (name or '').strip().lower()
 
+# Accept both our internal status 'completed' and API short codes like 'FT', 'AET', 'PEN'
+COMPLETED_STATUSES = frozenset(('completed', 'FT', 'AET', 'PEN'))
+# Fixtures in these states never block processing a round
+POSTPONED_STATUSES = frozenset(('PST', 'P', 'postponed', 'cancelled'))
+
 def fixture_decision(fix: Fixture):
     """Return 'HOME'|'AWAY'|'DRAW' if fixture completed, else None."""
     if not fix:
         return None
-    # Accept both our internal status 'completed' and API short codes like 'FT', 'AET', 'PEN'
-    completed = (fix.status in ('completed', 'FT', 'AET', 'PEN'))
-    if not completed:
+    if fix.status not in COMPLETED_STATUSES:
         return None
-    if fix.home_score is None or fix.away_score is None:
+    # Read each instrumented score attribute once
+    home_score, away_score = fix.home_score, fix.away_score
+    if home_score is None or away_score is None:
         return None
-    if fix.home_score > fix.away_score:
+    if home_score > away_score:
         return 'HOME'
-    if fix.away_score > fix.home_score:
+    if away_score > home_score:
         return 'AWAY'
     return 'DRAW'
 
-def pick_outcome_for_fixture(pick: 'Pick', fix: 'Fixture'):
-    """Classic LMS: must WIN. Draw or loss = elimination. Returns 'WIN'|'LOSE'|'PENDING'."""
-    result = fixture_decision(fix)
+def build_round_scorecard(fixtures):
+    """
+    Precompute {fixture_id: (home_norm, away_norm, decision)} for a round's fixtures,
+    so each pick is scored with dict lookups against the stored normalized names.
+    """
+    # Rows written before the *_team_norm columns existed fall back to normalizing on the fly
+    return {
+        f.id: (
+            f.home_team_norm or normalize_team(f.home_team),
+            f.away_team_norm or normalize_team(f.away_team),
+            fixture_decision(f),
+        )
+        for f in fixtures
+    }
+
+def index_scorecard_by_team(scorecard):
+    """Map each normalized team name in a scorecard to its fixture id."""
+    fixtures_by_team = {}
+    for fid, (home_norm, away_norm, _) in scorecard.items():
+        fixtures_by_team[home_norm] = fid
+        fixtures_by_team[away_norm] = fid
+    return fixtures_by_team
+
+def pick_outcome_for_fixture(team_norm: str, scored: tuple):
+    """
+    Classic LMS: must WIN. Draw or loss = elimination. Returns 'WIN'|'LOSE'|'PENDING'.
+    `team_norm` is the normalized picked team, `scored` a build_round_scorecard entry.
+    """
+    home_norm, away_norm, result = scored
     if result is None:
         return 'PENDING'
-    team = normalize_team(pick.team_picked)
-    if result == 'HOME' and team == normalize_team(fix.home_team):
+    if result == 'HOME' and team_norm == home_norm:
         return 'WIN'
-    if result == 'AWAY' and team == normalize_team(fix.away_team):
+    if result == 'AWAY' and team_norm == away_norm:
         return 'WIN'
     if result == 'DRAW':
         return 'LOSE'
     return 'LOSE'
 
 
+def apply_api_results(fixtures, results_by_id):
+    """
+    Copy API scores/status onto fixtures. `results_by_id` is keyed by string event_id
+    (as returned by get_fixtures_by_ids), which is what Fixture.event_id already stores,
+    so manual fixtures simply miss. Returns the number of fixtures updated.
+    """
+    updated = 0
+    for f in fixtures:
+        data = results_by_id.get(f.event_id)
+        if not data:
+            continue
+        score = data.get('score', {}).get('fullTime', {})
+        hs = score.get('home')
+        as_ = score.get('away')
+        status = data.get('status')
+        if hs is not None: f.home_score = hs
+        if as_ is not None: f.away_score = as_
+        if status == 'FINISHED': f.status = 'FT'
+        elif status: f.status = status
+        updated += 1
+    return updated
+
+def record_pick_outcomes(winning_pick_ids, losing_pick_ids):
+    """Write judged pick outcomes with one UPDATE per outcome instead of one per pick."""
+    if winning_pick_ids:
+        Pick.query.filter(Pick.id.in_(winning_pick_ids)).update(
+            {Pick.is_winner: True}, synchronize_session=False)
+    if losing_pick_ids:
+        Pick.query.filter(Pick.id.in_(losing_pick_ids)).update(
+            {Pick.is_winner: False, Pick.is_eliminated: True}, synchronize_session=False)
+
+def eliminate_players(player_ids):
+    """Mark the given players eliminated with a single UPDATE (no per-player loads)."""
+    if not player_ids:
+        return 0
+    return Player.query.filter(
+        Player.id.in_(player_ids), Player.status != 'eliminated'
+    ).update({Player.status: 'eliminated'}, synchronize_session=False)
+
+
 # Basic Route
 @app.route('/')
 def index():
@@ -275,7 +405,7 @@ def admin_fetch_fixtures():
         for fixture in upcoming_fixtures:
             home_team = fixture['home_team_name'] # Use cleaned data
             away_team = fixture['away_team_name'] # Use cleaned data
-            fixture_date = datetime.fromisoformat(fixture['date'].replace('Z', '+00:00')) # Convert ISO format to datetime
+            fixture_date = parse_iso(fixture['date']) # Convert ISO format to datetime
             output += f"<li>{home_team} vs {away_team} on {fixture_date.strftime('%Y-%m-%d %H:%M')}</li>"
         output += "</ul>"
     else:
@@ -324,8 +454,8 @@ def admin_create_round():
 
         try:
             round_number = int(round_number)
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+            start_date = date.fromisoformat(start_date_str)
+            end_date = date.fromisoformat(end_date_str)
         except ValueError:
             flash('Invalid input for round number or dates.', 'error')
             return redirect(url_for('admin_create_round'))
@@ -353,24 +483,28 @@ def admin_dashboard():
     print(f"DEBUG: WORKER_API_TOKEN in app.py = {os.environ.get('WORKER_API_TOKEN')}")
     # --- END DEBUGGING ---
     try:
-        players = Player.query.all()
-        current_round = Round.query.filter_by(status='open').first()
+        # Read-only page: nothing is pending in the session, so skip the autoflush checks
+        with db.session.no_autoflush:
+            # raiseload('*') makes any relationship touched without being loaded here fail loudly
+            players = Player.query.options(raiseload('*')).all()
+            # selectinload fetches the round's fixtures in one IN query alongside the round
+            current_round = Round.query.options(selectinload(Round.fixtures), raiseload('*')).filter_by(status='open').first()
         fixtures = []
         if current_round:
-            fixtures = Fixture.query.filter_by(round_id=current_round.id).order_by(Fixture.date).all()
+            fixtures = sorted(current_round.fixtures, key=lambda f: f.date)
 
         # Generate unique, tokenised pick links for each active player for the current round
         player_pick_links = {}
         cleaned_whatsapp_numbers = {}
         if current_round:
-            for player in players:
-                if player.status == 'active':
-                    token = make_pick_token(player.id, current_round.id)
-                    player_pick_links[player.id] = url_for('pick_with_token', token=token, _external=True)
-                    if player.whatsapp_number:
-                        # Clean the number by removing all non-digit characters
-                        cleaned_number = ''.join(filter(str.isdigit, player.whatsapp_number))
-                        cleaned_whatsapp_numbers[player.id] = cleaned_number
+            # The full player list is still rendered, so filter the already-loaded rows
+            active_players = [p for p in players if p.status == 'active']
+            for player in active_players:
+                token = make_pick_token(player.id, current_round.id)
+                player_pick_links[player.id] = url_for('pick_with_token', token=token, _external=True)
+                if player.whatsapp_number:
+                    # Clean the number by removing all non-digit characters
+                    cleaned_whatsapp_numbers[player.id] = _digits_only(player.whatsapp_number)
         has_wa_config = True  # Always true for queue-based system
 
         # Get queue statistics - with error handling
@@ -428,13 +562,13 @@ def pick_with_token(token):
         flash('Invalid or expired link.', 'error')
         return redirect(url_for('index'))
 
-    player = Player.query.get_or_404(player_id)
-    this_round = Round.query.get_or_404(round_id)
+    player = Player.query.options(raiseload('*')).get_or_404(player_id)
+    this_round = Round.query.options(selectinload(Round.fixtures), raiseload('*')).get_or_404(round_id)
     if this_round.status != 'open':
         flash(f'Round {this_round.round_number} is not open for picks.', 'error')
         return redirect(url_for('index'))
 
-    fixtures = Fixture.query.filter_by(round_id=this_round.id).order_by(Fixture.date).all()
+    fixtures = sorted(this_round.fixtures, key=lambda f: f.date)
 
     if request.method == 'POST':
         team_picked = request.form.get('team_picked')
@@ -451,9 +585,14 @@ def pick_with_token(token):
             flash(f'{player.name}, you have already made a pick for Round {this_round.round_number}. Your current pick is {existing_pick.team_picked}.', 'error')
         else:
             # Enforce global no-repeat rule: player cannot pick any team they have picked in any previous round
-            prior_picks = Pick.query.filter(Pick.player_id == player.id, Pick.round_id != this_round.id).all()
-            prior_teams = [p.team_picked for p in prior_picks]
-            if team_picked in prior_teams:
+            already_picked = db.session.query(
+                Pick.query.filter(
+                    Pick.player_id == player.id,
+                    Pick.round_id != this_round.id,
+                    Pick.team_picked == team_picked,
+                ).exists()
+            ).scalar()
+            if already_picked:
                 flash(f'{player.name}, you cannot pick {team_picked} because you have picked it before.', 'error')
                 return redirect(url_for('pick_with_token', token=token))
             db.session.add(Pick(player_id=player.id, round_id=this_round.id, team_picked=team_picked, timestamp=datetime.utcnow()))
@@ -481,11 +620,11 @@ def pick_with_token(token):
 # Player-specific Pick Submission
 @app.route('/submit_pick/<int:player_id>', methods=['GET', 'POST'])
 def submit_pick(player_id):
-    player = Player.query.get_or_404(player_id)
-    current_round = Round.query.filter_by(status='open').first()
+    player = Player.query.options(raiseload('*')).get_or_404(player_id)
+    current_round = Round.query.options(selectinload(Round.fixtures), raiseload('*')).filter_by(status='open').first()
     fixtures = []
     if current_round:
-        fixtures = Fixture.query.filter_by(round_id=current_round.id).order_by(Fixture.date).all()
+        fixtures = sorted(current_round.fixtures, key=lambda f: f.date)
 
     if request.method == 'POST':
         team_picked = request.form.get('team_picked')
@@ -527,17 +666,19 @@ def admin_bulk_register_players():
         player_names_raw = request.form['player_names']
         player_names = [name.strip() for name in player_names_raw.split('\n') if name.strip()]
         
-        registered_count = 0
-        skipped_count = 0
-        for player_name in player_names:
-            existing_player = Player.query.filter_by(name=player_name).first()
-            if existing_player:
-                skipped_count += 1
-            else:
-                new_player = Player(name=player_name, whatsapp_number=None) # WhatsApp number can be added later
-                db.session.add(new_player)
-                registered_count += 1
+        # One IN query for every name already registered; repeats in the input count as skipped
+        unique_names = list(dict.fromkeys(player_names))
+        existing_names = {
+            name for (name,) in db.session.query(Player.name).filter(Player.name.in_(unique_names))
+        }
+        new_players = [
+            Player(name=player_name, whatsapp_number=None)  # WhatsApp number can be added later
+            for player_name in unique_names if player_name not in existing_names
+        ]
+        db.session.bulk_save_objects(new_players)
         db.session.commit()
+        registered_count = len(new_players)
+        skipped_count = len(player_names) - registered_count
         flash(f'Successfully registered {registered_count} new players. Skipped {skipped_count} existing players.', 'success')
         return redirect(url_for('admin_dashboard'))
     return render_template('bulk_register_players.html')
@@ -560,10 +701,10 @@ def admin_manual_add_fixture():
                 flash('Invalid Round selected.', 'error')
                 return redirect(url_for('admin_manual_add_fixture'))
 
-            fixture_date = datetime.strptime(fixture_date_str, '%Y-%m-%d').date()
+            fixture_date = date.fromisoformat(fixture_date_str)
             # Combine date and time for the datetime object
             full_datetime_str = f"{fixture_date_str} {fixture_time_str}"
-            full_datetime = datetime.strptime(full_datetime_str, '%Y-%m-%d %H:%M')
+            full_datetime = datetime.fromisoformat(full_datetime_str)
 
             # Generate a unique event_id for manual fixtures (e.g., 'MANUAL_ROUND_FIXTURE_TIMESTAMP')
             event_id = f"MANUAL_{round_obj.round_number}_{home_team.replace(' ', '')}_{away_team.replace(' ', '')}_{full_datetime.strftime('%Y%m%d%H%M')}"
@@ -577,6 +718,8 @@ def admin_manual_add_fixture():
                     event_id=event_id,
                     home_team=home_team,
                     away_team=away_team,
+                    home_team_norm=normalize_team(home_team),
+                    away_team_norm=normalize_team(away_team),
                     date=full_datetime, # Store as datetime
                     time=fixture_time_str, # Store time string
                     status='scheduled'
@@ -600,13 +743,14 @@ def bulk_assign_fixtures(round_id):
     # Show only fixtures not yet assigned to any round
     fixtures = Fixture.query.filter(Fixture.round_id.is_(None)).order_by(Fixture.date.asc()).all()
     if request.method == 'POST':
-        selected_ids = request.form.getlist('fixture_ids')
+        selected_ids = [int(fid) for fid in request.form.getlist('fixture_ids')]
+        # One UPDATE for the whole selection; still only claims fixtures that are unassigned
         count = 0
-        for fid in selected_ids:
-            fx = Fixture.query.get(int(fid))
-            if fx and fx.round_id is None:
-                fx.round_id = round_id
-                count += 1
+        if selected_ids:
+            count = Fixture.query.filter(
+                Fixture.id.in_(selected_ids),
+                Fixture.round_id.is_(None),
+            ).update({Fixture.round_id: round_id}, synchronize_session=False)
         db.session.commit()
         flash(f"Assigned {count} fixtures to Round {round_obj.round_number}.", "success")
         return redirect(url_for('admin_dashboard'))
@@ -625,8 +769,10 @@ def admin_update_results(round_id):
         home_scores = request.form.getlist('home_score')
         away_scores = request.form.getlist('away_score')
         statuses = request.form.getlist('status')
+        # Load every submitted fixture in one query rather than one get() per row
+        rows = {f.id: f for f in Fixture.query.filter(Fixture.id.in_([int(fid) for fid in ids])).all()}
         for i, fid in enumerate(ids):
-            f = Fixture.query.get(int(fid))
+            f = rows[int(fid)]
             hs = home_scores[i].strip()
             as_ = away_scores[i].strip()
             st = statuses[i].strip() or 'scheduled'
@@ -651,20 +797,7 @@ def admin_auto_update_results(round_id):
         return redirect(url_for('admin_update_results', round_id=round_id))
 
     results_by_id = get_fixtures_by_ids(event_ids)
-    updated = 0
-    for f in fixtures:
-        if str(f.event_id).isdigit():
-            data = results_by_id.get(str(f.event_id))
-            if data:
-                score = data.get('score', {}).get('fullTime', {})
-                hs = score.get('home')
-                as_ = score.get('away')
-                status = data.get('status')
-                if hs is not None: f.home_score = hs
-                if as_ is not None: f.away_score = as_
-                if status == 'FINISHED': f.status = 'FT'
-                elif status: f.status = status
-                updated += 1
+    updated = apply_api_results(fixtures, results_by_id)
 
     db.session.commit()
     flash(f'Auto-updated {updated} fixtures from API.', 'success')
@@ -684,30 +817,17 @@ def admin_auto_update_and_process_round(round_id):
     
     if event_ids:
         results_by_id = get_fixtures_by_ids(event_ids)
-        updated_count = 0
-        for f in fixtures:
-            if str(f.event_id).isdigit():
-                data = results_by_id.get(str(f.event_id))
-                if data:
-                    score = data.get('score', {}).get('fullTime', {})
-                    hs = score.get('home')
-                    as_ = score.get('away')
-                    status = data.get('status')
-                    if hs is not None: f.home_score = hs
-                    if as_ is not None: f.away_score = as_
-                    if status == 'FINISHED': f.status = 'FT'
-                    elif status: f.status = status
-                    updated_count += 1
+        updated_count = apply_api_results(fixtures, results_by_id)
         db.session.commit()
         app.logger.info(f"Auto-updated {updated_count} fixtures from API.")
 
     # 2. Process eliminations (same logic as admin_process_round)
-    fixtures_by_team = {normalize_team(f.home_team): f for f in rnd.fixtures}
-    fixtures_by_team.update({normalize_team(f.away_team): f for f in rnd.fixtures})
+    scorecard = build_round_scorecard(rnd.fixtures)
+    fixtures_by_team = index_scorecard_by_team(scorecard)
 
     undecided = []
     for f in rnd.fixtures:
-        if fixture_decision(f) is None and f.status not in ('PST', 'P', 'postponed', 'cancelled'):
+        if scorecard[f.id][2] is None and f.status not in POSTPONED_STATUSES:
             undecided.append(f)
     
     if undecided:
@@ -716,21 +836,25 @@ def admin_auto_update_and_process_round(round_id):
 
     eliminated = 0
     survived = 0
+    winning_pick_ids = []
+    losing_pick_ids = []
+    losing_ids = set()
     for pick in rnd.picks:
         if pick.is_winner is not None: continue
-        fix = fixtures_by_team.get(normalize_team(pick.team_picked))
-        if not fix: continue
-        outcome = pick_outcome_for_fixture(pick, fix)
+        team_norm = normalize_team(pick.team_picked)
+        fid = fixtures_by_team.get(team_norm)
+        if fid is None: continue
+        outcome = pick_outcome_for_fixture(team_norm, scorecard[fid])
         if outcome == 'WIN':
-            pick.is_winner = True
+            winning_pick_ids.append(pick.id)
             survived += 1
         elif outcome == 'LOSE':
-            pick.is_winner = False
-            pick.is_eliminated = True
-            if pick.player.status != 'eliminated':
-                pick.player.status = 'eliminated'
+            losing_pick_ids.append(pick.id)
+            losing_ids.add(pick.player_id)
             eliminated += 1
 
+    record_pick_outcomes(winning_pick_ids, losing_pick_ids)
+    eliminate_players(losing_ids)
     rnd.status = 'completed'
     db.session.commit()
 
@@ -742,13 +866,14 @@ def admin_auto_update_and_process_round(round_id):
 # ----------------- Admin: Process round (determine eliminations) -----------------
 @app.route('/admin/process_round/<int:round_id>', methods=['GET'])
 def admin_process_round(round_id):
-    rnd = Round.query.get_or_404(round_id)
-    fixtures_by_team = {normalize_team(f.home_team): f for f in rnd.fixtures}
-    fixtures_by_team.update({normalize_team(f.away_team): f for f in rnd.fixtures})
+    # Fixtures and picks are both walked below; fetch each with one IN query up front
+    rnd = Round.query.options(selectinload(Round.fixtures), selectinload(Round.picks)).get_or_404(round_id)
+    scorecard = build_round_scorecard(rnd.fixtures)
+    fixtures_by_team = index_scorecard_by_team(scorecard)
 
     undecided = []
     for f in rnd.fixtures:
-        if fixture_decision(f) is None and f.status not in ('PST', 'P', 'postponed', 'cancelled'):
+        if scorecard[f.id][2] is None and f.status not in POSTPONED_STATUSES:
             undecided.append(f)
     if undecided:
         flash(f'There are {len(undecided)} undecided fixtures. Enter scores or auto-update before processing.', 'warning')
@@ -756,28 +881,32 @@ def admin_process_round(round_id):
 
     eliminated = 0
     survived = 0
+    winning_pick_ids = []
+    losing_pick_ids = []
+    losing_ids = set()
     for pick in rnd.picks:
         # if already judged, skip
         if pick.is_winner is not None:
             continue
-        fix = fixtures_by_team.get(normalize_team(pick.team_picked))
-        if not fix:
+        team_norm = normalize_team(pick.team_picked)
+        fid = fixtures_by_team.get(team_norm)
+        if fid is None:
             # no matching fixture -> leave pending
             continue
-        outcome = pick_outcome_for_fixture(pick, fix)
+        outcome = pick_outcome_for_fixture(team_norm, scorecard[fid])
         if outcome == 'WIN':
-            pick.is_winner = True
+            winning_pick_ids.append(pick.id)
             survived += 1
         elif outcome == 'LOSE':
-            pick.is_winner = False
-            pick.is_eliminated = True
-            if pick.player.status != 'eliminated':
-                pick.player.status = 'eliminated'
+            losing_pick_ids.append(pick.id)
+            losing_ids.add(pick.player_id)
             eliminated += 1
         else:
             # PENDING: leave as None
             pass
 
+    record_pick_outcomes(winning_pick_ids, losing_pick_ids)
+    eliminate_players(losing_ids)
     rnd.status = 'completed'
     db.session.commit()
 
@@ -789,7 +918,7 @@ def admin_process_round(round_id):
 @app.route('/admin/round_summary/<int:round_id>')
 def admin_round_summary(round_id):
     rnd = Round.query.get_or_404(round_id)
-    picks = Pick.query.filter_by(round_id=round_id).all()
+    picks = Pick.query.options(joinedload(Pick.player)).filter_by(round_id=round_id).all()
 
     def outcome_label(p):
         if p.is_winner is True:
@@ -810,14 +939,15 @@ def admin_round_summary(round_id):
 
 @app.route('/standings')
 def standings():
-    active = Player.query.filter_by(status='active').order_by(Player.name.asc()).all()
-    eliminated = Player.query.filter_by(status='eliminated').order_by(Player.name.asc()).all()
+    # The page only shows names, so fetch that column rather than full Player objects
+    active = db.session.query(Player.name).filter_by(status='active').order_by(Player.name.asc()).all()
+    eliminated = db.session.query(Player.name).filter_by(status='eliminated').order_by(Player.name.asc()).all()
     return render_template('standings.html', active=active, eliminated=eliminated)
 
 @app.route('/admin/generate_round_summary_for_whatsapp/<int:round_id>')
 def generate_round_summary_for_whatsapp(round_id):
     rnd = Round.query.get_or_404(round_id)
-    picks = Pick.query.filter_by(round_id=round_id).all()
+    picks = Pick.query.options(joinedload(Pick.player)).filter_by(round_id=round_id).all()
 
     summary_lines = [f"*LMS Round {rnd.round_number} Picks:*"]
     for pick in picks:
@@ -829,33 +959,42 @@ def generate_round_summary_for_whatsapp(round_id):
 
 @app.route('/admin/download_fixtures')
 def download_fixtures():
-    si = io.StringIO()
-    cw = csv.writer(si)
-
     headers = ["Round Number", "Home Team", "Away Team", "Date", "Time", "Status", "Home Score", "Away Score"]
-    cw.writerow(headers)
 
-    # Get all fixtures, including unassigned ones
-    fixtures = Fixture.query.outerjoin(Round).order_by(
+    # Get all fixtures, including unassigned ones; contains_eager fills fixture.round from the
+    # outer join itself instead of a lazy SELECT per row
+    fixtures = Fixture.query.outerjoin(Round).options(
+        contains_eager(Fixture.round), raiseload('*')
+    ).order_by(
         Round.round_number.asc().nullsfirst(), 
         Fixture.date.asc()
-    ).all()
-
-    for fixture in fixtures:
-        row = [
-            fixture.round.round_number if fixture.round else "N/A",
-            fixture.home_team,
-            fixture.away_team,
-            fixture.date.strftime('%Y-%m-%d') if fixture.date else "N/A",
-            fixture.time,
-            fixture.status,
-            fixture.home_score if fixture.home_score is not None else "",
-            fixture.away_score if fixture.away_score is not None else ""
-        ]
-        cw.writerow(row)
-
-    output = si.getvalue()
-    response = Response(output, mimetype="text/csv")
+    ).yield_per(500)
+
+    def generate():
+        # Rows are written to a small reusable buffer and streamed out as they are fetched
+        si = io.StringIO()
+        cw = csv.writer(si)
+        cw.writerow(headers)
+        for fixture in fixtures:
+            row = [
+                fixture.round.round_number if fixture.round else "N/A",
+                fixture.home_team,
+                fixture.away_team,
+                fixture.date.strftime('%Y-%m-%d') if fixture.date else "N/A",
+                fixture.time,
+                fixture.status,
+                fixture.home_score if fixture.home_score is not None else "",
+                fixture.away_score if fixture.away_score is not None else ""
+            ]
+            cw.writerow(row)
+            yield si.getvalue()
+            si.seek(0)
+            si.truncate()
+        # Header-only export when there are no fixtures
+        if si.tell():
+            yield si.getvalue()
+
+    response = Response(stream_with_context(generate()), mimetype="text/csv")
     response.headers["Content-Disposition"] = "attachment; filename=lms_fixtures.csv"
     return response
 
@@ -888,7 +1027,10 @@ def eliminate_player(player_id):
 
 @app.route('/admin/unassigned_fixtures')
 def admin_unassigned_fixtures():
-    fixtures = Fixture.query.filter(Fixture.round_id.is_(None)).order_by(Fixture.date.asc()).all()
+    # Read-only listing: plain rows with just the rendered columns, no ORM instances
+    fixtures = db.session.query(
+        Fixture.home_team, Fixture.away_team, Fixture.date, Fixture.time, Fixture.round_id
+    ).filter(Fixture.round_id.is_(None)).order_by(Fixture.date.asc()).all()
     return render_template('unassigned_fixtures.html', fixtures=fixtures, show_round_id=True)
 
 
@@ -935,46 +1077,79 @@ def admin_send_whatsapp_links():
 
     queued = 0
     failed = 0
+    skipped = 0
     details = []
+    rows = []
+
+    # Players whose link for this round is still pending in the queue (e.g. a repeated click) are
+    # not queued twice; one query up front instead of a lookup per player. Rows a worker has
+    # already claimed don't count, so a claim that never finished doesn't block a resend.
+    pending_messages = defaultdict(list)
+    for pid, message in db.session.query(SendQueue.player_id, SendQueue.message).filter(
+            SendQueue.status == 'pending', SendQueue.player_id.isnot(None)):
+        pending_messages[pid].append(message)
+
+    def note(line):
+        # Only the first few outcomes are surfaced in the flash preview
+        if len(details) < 5:
+            details.append(line)
+
+    # Generate pick links with proper base URL (the same for every player)
+    base_url = os.environ.get('BASE_URL', request.url_root.rstrip('/'))
     
     for p in players:
         # Skip players marked unreachable
         if getattr(p, 'unreachable', False):
-            details.append(f"{p.name}: unreachable")
+            note(f"{p.name}: unreachable")
             failed += 1
             continue
         if not p.whatsapp_number:
-            details.append(f"{p.name}: no number")
+            note(f"{p.name}: no number")
             failed += 1
             continue
         
         if not is_valid_phone_number(p.whatsapp_number):
-            details.append(f"{p.name}: invalid number")
+            note(f"{p.name}: invalid number")
             failed += 1
             continue
         
         to_digits = to_e164_digits(p.whatsapp_number)
 
         token = make_pick_token(p.id, current_round.id)
-        # Generate pick link with proper base URL
-        base_url = os.environ.get('BASE_URL', request.url_root.rstrip('/'))
+        if any(f"/l/{token}" in message for message in pending_messages.get(p.id, ())):
+            note(f"{p.name}: already queued")
+            skipped += 1
+            continue
         pick_link = f"{base_url}/l/{token}"
         body = build_pick_message(p.name, current_round.round_number, pick_link)
         
-        # Queue the message
-        ok, err = queue_whatsapp_message(to_digits, body, p.id)
-        
-        if ok:
-            queued += 1
-            details.append(f"{p.name}: queued")
-        else:
-            failed += 1
-            details.append(f"{p.name}: failed ({err})")
-            app.logger.error(f"Failed to queue WhatsApp to {p.name}: {err}")
+        # Collect the row; all messages are inserted together below
+        rows.append({'player_id': p.id, 'number': to_digits, 'message': body, 'status': 'pending'})
+        note(f"{p.name}: queued")
 
-    flash(f"WhatsApp messages queued: {queued} queued, {failed} failed.", 'success' if queued and not failed else 'warning')
+    if rows:
+        try:
+            # One executemany INSERT instead of an ORM add + commit per message. Rows the unique
+            # index turns away return nothing, so count what RETURNING hands back
+            # (executemany rowcount isn't reliable on psycopg2)
+            inserted = db.session.execute(
+                _send_queue_insert().returning(SendQueue.__table__.c.id), rows
+            ).all()
+            db.session.commit()
+            queued = len(inserted)
+            skipped += len(rows) - queued
+        except Exception as e:
+            db.session.rollback()
+            failed += len(rows)
+            note(f"queue insert failed ({e})")
+            app.logger.error(f"Failed to queue {len(rows)} WhatsApp messages: {e}")
+
+    summary = f"WhatsApp messages queued: {queued} queued, {failed} failed"
+    if skipped:
+        summary += f", {skipped} already queued"
+    flash(f"{summary}.", 'success' if queued and not failed else 'warning')
     # Also surface a few detail lines for quick debug
-    preview = "; ".join(details[:5])
+    preview = "; ".join(details)
     if preview:
         flash(f"Examples: {preview}", 'info')
     
@@ -1014,6 +1189,8 @@ def admin_send_whatsapp_link(player_id):
 
     if ok:
         flash(f"Queued pick link for {player.name}.", "success")
+    elif err == ALREADY_QUEUED:
+        flash(f"Pick link for {player.name} is already queued.", "info")
     else:
         flash(f"Failed to queue message for {player.name}: {err}", "error")
     return redirect(url_for('admin_dashboard'))
@@ -1022,7 +1199,7 @@ def admin_send_whatsapp_link(player_id):
 @app.route('/player_picks/<int:player_id>')
 def player_picks(player_id):
     player = Player.query.get_or_404(player_id)
-    picks = Pick.query.filter_by(player_id=player.id).join(Round).order_by(Round.round_number).all()
+    picks = Pick.query.filter_by(player_id=player.id).join(Round).options(contains_eager(Pick.round)).order_by(Round.round_number).all()
     return render_template('player_picks.html', player=player, picks=picks)
 
 
@@ -1034,7 +1211,7 @@ def my_picks(token):
         return redirect(url_for('index'))
 
     player = Player.query.get_or_404(player_id)
-    picks = Pick.query.filter_by(player_id=player.id).join(Round).order_by(Round.round_number).all()
+    picks = Pick.query.filter_by(player_id=player.id).join(Round).options(contains_eager(Pick.round)).order_by(Round.round_number).all()
     return render_template('my_picks.html', player=player, picks=picks)
 
 
@@ -1073,6 +1250,64 @@ def validate_worker_token():
     token = auth_header.replace('Bearer ', '')
     return token == WORKER_API_TOKEN
 
+def _claim_pending_jobs_returning(limit=None):
+    """
+    PostgreSQL: claim pending jobs with a single UPDATE ... RETURNING.
+    FOR UPDATE SKIP LOCKED lets concurrent workers poll without handing out the same job.
+    """
+    claim = select(SendQueue.id).where(SendQueue.status == 'pending').order_by(SendQueue.id)
+    if limit is not None:
+        claim = claim.limit(limit)
+    stmt = (
+        update(SendQueue)
+        .where(SendQueue.id.in_(claim.with_for_update(skip_locked=True).scalar_subquery()))
+        .values(status='in_progress', attempts=SendQueue.attempts + 1)
+        .returning(SendQueue.id, SendQueue.number, SendQueue.message, SendQueue.player_id)
+    )
+    jobs = [dict(row) for row in db.session.execute(stmt).mappings()]
+    db.session.commit()
+    return jobs
+
+# A claim older than this belongs to a worker that died without reporting back; well above the
+# time a worker needs to work through a full batch at its anti-detection pace
+STALE_CLAIM_MINUTES = int(os.environ.get('STALE_CLAIM_MINUTES', '120'))
+
+def _release_stale_claims():
+    """Return long-abandoned in_progress jobs to pending, so they are sent and stop blocking re-queues."""
+    cutoff = datetime.now(pytz.utc) - timedelta(minutes=STALE_CLAIM_MINUTES)
+    db.session.execute(
+        update(SendQueue)
+        .where(SendQueue.status == 'in_progress', SendQueue.updated_at < cutoff)
+        .values(status='pending')
+    )
+
+def _claim_pending_jobs(limit=None):
+    """Mark up to `limit` (or all) pending messages in_progress and return them as job dicts."""
+    _release_stale_claims()
+    if db.engine.dialect.name == 'postgresql':
+        return _claim_pending_jobs_returning(limit)
+
+    # Get pending messages as plain rows; the job payload is serialized straight from them
+    query = db.session.query(
+        SendQueue.id, SendQueue.number, SendQueue.message, SendQueue.player_id
+    ).filter_by(status='pending')
+    if limit is not None:
+        query = query.limit(limit)
+    jobs = [row._asdict() for row in query]
+
+    # Mark them as in_progress to avoid double processing, in one UPDATE
+    if jobs:
+        SendQueue.query.filter(SendQueue.id.in_([job['id'] for job in jobs])).update(
+            {SendQueue.status: 'in_progress', SendQueue.attempts: SendQueue.attempts + 1},
+            synchronize_session=False)
+    db.session.commit()
+    return jobs
+
+@app.route('/api/health', methods=['GET'])
+def api_health():
+    """Liveness probe for workers (HEAD is answered too); touches neither the DB nor the queue."""
+    return {'status': 'ok'}
+
 @app.route('/api/queue/next', methods=['GET'])
 def api_queue_next():
     """API endpoint to get next pending messages for the worker"""
@@ -1080,23 +1315,7 @@ def api_queue_next():
         return {'error': 'Unauthorized'}, 401
     
     limit = request.args.get('limit', 10, type=int)
-    
-    # Get pending messages, mark them as in_progress to avoid double processing
-    pending = SendQueue.query.filter_by(status='pending').limit(limit).all()
-    
-    jobs = []
-    for item in pending:
-        item.status = 'in_progress'
-        item.attempts += 1
-        jobs.append({
-            'id': item.id,
-            'number': item.number,
-            'message': item.message,
-            'player_id': item.player_id
-        })
-    
-    db.session.commit()
-    return jobs
+    return _claim_pending_jobs(limit)
 
 @app.route('/api/queue/all_pending', methods=['GET'])
 def api_queue_all_pending():
@@ -1106,22 +1325,16 @@ def api_queue_all_pending():
     if not validate_worker_token():
         return {'error': 'Unauthorized'}, 401
 
-    # Get all pending messages, mark them as in_progress to avoid double processing
-    pending = SendQueue.query.filter_by(status='pending').all()
-    
-    jobs = []
-    for item in pending:
-        item.status = 'in_progress'
-        item.attempts += 1
-        jobs.append({
-            'id': item.id,
-            'number': item.number,
-            'message': item.message,
-            'player_id': item.player_id
-        })
-    
-    db.session.commit()
-    return jobs
+    return _claim_pending_jobs()
+
+def _flag_unreachable_players(player_ids):
+    """Mark players unreachable when 5 of their last 10 queued messages failed."""
+    for player_id in player_ids:
+        # Count and flag in a single UPDATE instead of loading the player's history
+        Player.query.filter(
+            Player.id == player_id,
+            _recent_failures_subquery(player_id, window=10) >= 5,
+        ).update({Player.unreachable: True}, synchronize_session=False)
 
 @app.route('/api/queue/mark', methods=['POST'])
 def api_queue_mark():
@@ -1134,7 +1347,8 @@ def api_queue_mark():
     status = data.get('status')  # 'sent' or 'failed'
     error = data.get('error')
     
-    item = SendQueue.query.get(job_id)
+    # Only player_id is needed here; skip the default Player JOIN and fail loudly on lazy loads
+    item = SendQueue.query.options(raiseload('*')).get(job_id)
     if not item:
         return {'error': 'Job not found'}, 404
     
@@ -1144,32 +1358,61 @@ def api_queue_mark():
     
     # Check for consecutive failures and mark player unreachable
     if status == 'failed' and item.player_id:
-        fails = _consecutive_whatsapp_failures(item.player_id, window=10)
-        if fails >= 5:
-            player = Player.query.get(item.player_id)
-            if player:
-                player.unreachable = True
+        _flag_unreachable_players([item.player_id])
     
     db.session.commit()
     return {'success': True}
 
+@app.route('/api/queue/mark_bulk', methods=['POST'])
+def api_queue_mark_bulk():
+    """
+    API endpoint to report several job outcomes at once.
+    Body: {"updates": [{"id": 1, "status": "sent"}, {"id": 2, "status": "failed", "error": "..."}]}
+    """
+    if not validate_worker_token():
+        return {'error': 'Unauthorized'}, 401
+
+    updates = (request.get_json() or {}).get('updates') or []
+    by_id = {u['id']: u for u in updates if u.get('id') is not None}
+
+    # Only ids that exist are updated; their player ids feed the unreachable check
+    found = dict(db.session.execute(
+        select(SendQueue.id, SendQueue.player_id).where(SendQueue.id.in_(by_id))
+    ).all()) if by_id else {}
+
+    if found:
+        # One executemany UPDATE for the batch instead of loading and flushing each row
+        queue = SendQueue.__table__
+        db.session.execute(
+            update(queue)
+            .where(queue.c.id == bindparam('job_id'))
+            .values(
+                status=bindparam('new_status'),
+                last_error=func.coalesce(bindparam('error'), queue.c.last_error),
+            ),
+            [
+                {
+                    'job_id': job_id,
+                    'new_status': by_id[job_id].get('status'),
+                    'error': str(by_id[job_id]['error']) if by_id[job_id].get('error') else None,
+                }
+                for job_id in found
+            ],
+        )
+
+    # Each player's failure history is checked once, after all of this batch's statuses are written
+    _flag_unreachable_players({
+        player_id for job_id, player_id in found.items()
+        if player_id and by_id[job_id].get('status') == 'failed'
+    })
+
+    db.session.commit()
+    return {'success': True, 'updated': len(found), 'missing': [i for i in by_id if i not in found]}
+
 
 # ----------------- Database Initialization Route -----------------
-@app.route('/admin/init_db', methods=['GET', 'POST'])
-def admin_init_db():
-    """Initialize or reset the database"""
-    if request.method == 'POST':
-        try:
-            # Import and run init_db function
-            from init_db import init_db
-            init_db()
-            flash('Database initialized successfully!', 'success')
-        except Exception as e:
-            flash(f'Database initialization failed: {e}', 'error')
-        return redirect(url_for('admin_dashboard'))
-    
-    # Show confirmation form
-    return render_template_string('''
+# Compiled once at import; render_template_string would re-parse it on every GET
+_INIT_DB_TEMPLATE = app.jinja_env.from_string('''
     {% extends "base.html" %}
     {% block title %}Initialize Database{% endblock %}
     {% block content %}
@@ -1188,6 +1431,22 @@ def admin_init_db():
     {% endblock %}
     ''')
 
+@app.route('/admin/init_db', methods=['GET', 'POST'])
+def admin_init_db():
+    """Initialize or reset the database"""
+    if request.method == 'POST':
+        try:
+            # Import and run init_db function
+            from init_db import init_db
+            init_db()
+            flash('Database initialized successfully!', 'success')
+        except Exception as e:
+            flash(f'Database initialization failed: {e}', 'error')
+        return redirect(url_for('admin_dashboard'))
+    
+    # Show confirmation form
+    return render_template(_INIT_DB_TEMPLATE)
+
 # ----------------- Missing Admin Routes -----------------
 
 @app.route('/admin/new_game', methods=['POST'])
@@ -1216,13 +1475,18 @@ def admin_load_fixtures(season_year):
         flash(f"No fixtures found for season {season_year} from API.", 'warning')
         return redirect(url_for('admin_dashboard'))
 
-    fixtures_added_count = 0
-    for fixture_api in fixtures_data:
-        event_id = str(fixture_api['fixture']['id'])
+    # Index the API payload by event_id and load every matching fixture in one query
+    api_by_event_id = {str(f['fixture']['id']): f for f in fixtures_data}
+    existing_by_event_id = {
+        f.event_id: f for f in Fixture.query.filter(Fixture.event_id.in_(api_by_event_id)).all()
+    }
+
+    new_fixtures = []
+    for event_id, fixture_api in api_by_event_id.items():
         home_team = fixture_api['teams']['home']['name']
         away_team = fixture_api['teams']['away']['name']
         fixture_date_str = fixture_api['fixture']['date']
-        fixture_date = datetime.fromisoformat(fixture_date_str.replace('Z', '+00:00'))
+        fixture_date = parse_iso(fixture_date_str)
         
         # Extract Premier League matchday number
         round_name = fixture_api['league']['round']
@@ -1231,23 +1495,22 @@ def admin_load_fixtures(season_year):
         except (IndexError, ValueError):
             pl_matchday = 1
 
-        # Check if fixture already exists
-        existing_fixture = Fixture.query.filter_by(event_id=event_id).first()
+        existing_fixture = existing_by_event_id.get(event_id)
         if not existing_fixture:
-            new_fixture = Fixture(
+            new_fixtures.append(Fixture(
                 round_id=None,  # Don't auto-assign to game rounds - let admin create rounds manually
                 round_number=pl_matchday,  # Store the Premier League matchday number
                 event_id=event_id,
                 home_team=home_team,
                 away_team=away_team,
+                home_team_norm=normalize_team(home_team),
+                away_team_norm=normalize_team(away_team),
                 date=fixture_date,
                 time=fixture_date.strftime('%H:%M'),
                 home_score=fixture_api['goals']['home'],
                 away_score=fixture_api['goals']['away'],
                 status=fixture_api['fixture']['status']['short']
-            )
-            db.session.add(new_fixture)
-            fixtures_added_count += 1
+            ))
         else:
             # Update existing fixture
             existing_fixture.round_number = pl_matchday  # Update the PL matchday
@@ -1255,6 +1518,9 @@ def admin_load_fixtures(season_year):
             existing_fixture.away_score = fixture_api['goals']['away']
             existing_fixture.status = fixture_api['fixture']['status']['short']
 
+    # Batched INSERT for the new rows instead of one flush per fixture
+    db.session.bulk_save_objects(new_fixtures)
+    fixtures_added_count = len(new_fixtures)
     db.session.commit()
     flash(f"Loaded {fixtures_added_count} new fixtures for season {season_year}. Existing fixtures updated.", 'success')
     return redirect(url_for('admin_dashboard'))
@@ -1270,70 +1536,26 @@ def admin_next_round():
     next_game_round = (last_round.round_number + 1) if last_round else 1
     
     # SMART LOGIC: Find the next unplayed Premier League matchday
-    # Get all fixtures and group them by their Premier League matchday (stored in round_number)
-    all_fixtures = Fixture.query.order_by(Fixture.date.asc()).all()
-    
-    # Group fixtures by Premier League matchday
-    matchday_fixtures = {}
-    for fixture in all_fixtures:
-        # Use the stored round_number which contains the Premier League matchday
-        pl_matchday = fixture.round_number if fixture.round_number else 1
-        
-        if pl_matchday not in matchday_fixtures:
-            matchday_fixtures[pl_matchday] = {
-                'all': [],
-                'assigned': [],
-                'unassigned': []
-            }
-        
-        matchday_fixtures[pl_matchday]['all'].append(fixture)
-        if fixture.round_id is None:
-            matchday_fixtures[pl_matchday]['unassigned'].append(fixture)
-        else:
-            matchday_fixtures[pl_matchday]['assigned'].append(fixture)
-    
-    # Find the earliest matchday that has unassigned fixtures
-    available_matchdays = sorted(matchday_fixtures.keys())
-    next_matchday = None
-    next_round_fixtures = []
-    
-    for matchday in available_matchdays:
-        if matchday_fixtures[matchday]['unassigned']:
-            next_matchday = matchday
-            next_round_fixtures = matchday_fixtures[matchday]['unassigned']
-            break
-    
-    # If no unassigned fixtures found in weekly groups, fall back to any unassigned fixtures
-    if not next_round_fixtures:
-        unassigned_fixtures = Fixture.query.filter(Fixture.round_id.is_(None)).order_by(Fixture.date.asc()).all()
-        if unassigned_fixtures:
-            next_round_fixtures = unassigned_fixtures[:10]  # Take next 10 fixtures
-            next_matchday = 1
-    
-    # Calculate start and end dates from selected fixtures
-    start_date = None
-    end_date = None
-    
+    # Only unassigned fixtures can go into a new round, so group just those by their
+    # Premier League matchday (stored in round_number) in a single pass
+    all_unassigned = Fixture.query.filter(Fixture.round_id.is_(None)).order_by(Fixture.date.asc()).all()
+    unassigned_by_matchday = defaultdict(list)
+    for fixture in all_unassigned:
+        unassigned_by_matchday[fixture.round_number or 1].append(fixture)
+
+    # The earliest matchday that still has unassigned fixtures
+    next_matchday = min(unassigned_by_matchday, default=None)
+    next_round_fixtures = unassigned_by_matchday[next_matchday] if next_matchday is not None else []
+
+    # Calculate start and end dates from selected fixtures; the query already returns
+    # them in date order, so the round spans the first to the last kick-off
     if next_round_fixtures:
-        fixture_dates = []
-        for f in next_round_fixtures:
-            if f.date:
-                if hasattr(f.date, 'date'):
-                    fixture_dates.append(f.date.date())
-                else:
-                    fixture_dates.append(f.date)
-        
-        if fixture_dates:
-            start_date = min(fixture_dates)
-            end_date = max(fixture_dates)
-    
-    if not start_date:
+        start_date = next_round_fixtures[0].date.date()
+        end_date = next_round_fixtures[-1].date.date()
+    else:
         start_date = date.today()
         end_date = date.today()
     
-    # Get all unassigned fixtures for fallback display
-    all_unassigned = Fixture.query.filter(Fixture.round_id.is_(None)).order_by(Fixture.date.asc()).all()
-    
     return render_template('next_round.html', 
                          game_round_number=next_game_round,
                          league_round_number=next_matchday or 1,
@@ -1357,9 +1579,8 @@ def admin_create_next_round():
             return redirect(url_for('admin_next_round'))
         
         # Parse dates
-        from datetime import datetime
-        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        start_date = date.fromisoformat(start_date_str)
+        end_date = date.fromisoformat(end_date_str)
         
         # Validate dates
         if start_date > end_date:
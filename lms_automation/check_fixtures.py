@@ -1,9 +1,13 @@
 from .app import app, db
 from .models import Fixture
-from datetime import datetime
+from sqlalchemy import select
 
 with app.app_context():
-    fixtures_2025 = Fixture.query.filter(db.extract('year', Fixture.date) == 2025).all()
+    # Plain column rows: nothing here needs mapped Fixture objects
+    fixtures_2025 = db.session.execute(
+        select(Fixture.home_team, Fixture.away_team, Fixture.date)
+        .where(db.extract('year', Fixture.date) == 2025)
+    ).all()
     if fixtures_2025:
         print(f"Found {len(fixtures_2025)} fixtures for the 2025 season:")
         for fixture in fixtures_2025:
@@ -1,8 +1,10 @@
 from lms_automation.app import app, db
 from lms_automation.models import Round
+from sqlalchemy import select
 
 with app.app_context():
-    rounds = Round.query.all()
+    # Plain column rows: nothing here needs mapped Round objects
+    rounds = db.session.execute(select(Round.round_number, Round.status)).all()
     if rounds:
         print(f"Found {len(rounds)} rounds:")
         for r in rounds:
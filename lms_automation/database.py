@@ -1,4 +1,24 @@
 # lms_automation/database.py
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
+
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_conn, _connection_record):
+    """
+    Local/dev SQLite: WAL lets the worker's queue polls read while the app writes,
+    and NORMAL sync skips the per-commit fsync of the rollback journal. No-op on Postgres.
+    """
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cur = dbapi_conn.cursor()
+    cur.execute('PRAGMA journal_mode=WAL')
+    cur.execute('PRAGMA synchronous=NORMAL')
+    cur.execute('PRAGMA temp_store=MEMORY')
+    cur.execute('PRAGMA mmap_size=268435456')
+    cur.close()
@@ -1,9 +1,120 @@
 # lms_automation/football_data_api.py
 import os
+import time
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import wraps
 from zoneinfo import ZoneInfo
 
+# One pooled, keep-alive session for every football-data.org call; transient failures are
+# retried with backoff. 429 is not: its Retry-After can be a minute, slept inside a web request
+# and outside _RATE_LIMIT, which is what keeps the calls under the limit in the first place
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504]),
+))
+_TIMEOUT = 10
+
+class _RateLimitWait(requests.exceptions.RequestException):
+    """The next free request slot is further off than the caller is willing to wait."""
+
+class _TokenBucket:
+    """Thread-safe limiter: at most `per_minute` requests per rolling minute, bursting up to that many."""
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait: float | None = None):
+        """
+        Reserve the next request slot and sleep until it arrives. Only the bookkeeping holds
+        the lock, so concurrent callers queue up for successive slots instead of each other.
+        Raises _RateLimitWait, reserving nothing, if the slot is more than `max_wait` seconds away.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # A negative balance is slots already promised to callers still sleeping
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                raise _RateLimitWait(f"rate limited: next request slot in {wait:.0f}s")
+            self.tokens -= 1
+        if wait:
+            time.sleep(wait)
+
+# Free tier allows 10 requests/minute; paid plans can raise it via the environment
+_RATE_LIMIT = _TokenBucket(int(os.getenv('FOOTBALL_DATA_REQUESTS_PER_MINUTE', '10')))
+# These calls run inside web requests: past this wait, fail (callers return what they have)
+# rather than hold the request open for most of a minute
+_MAX_RATE_LIMIT_WAIT = float(os.getenv('FOOTBALL_DATA_MAX_WAIT_SECONDS', '10'))
+
+# url+params -> (ETag, parsed JSON), so unchanged responses come back as a bodyless 304
+_ETAG_CACHE = {}
+_ETAG_CACHE_MAX = 256
+
+def _get_json(url: str, token: str, params: dict | None = None):
+    """GET a football-data.org resource as JSON, revalidating with If-None-Match when possible."""
+    key = (url, tuple(sorted((params or {}).items())))
+    headers = {'X-Auth-Token': token}
+    cached = _ETAG_CACHE.get(key)
+    if cached:
+        headers['If-None-Match'] = cached[0]
+    _RATE_LIMIT.acquire(_MAX_RATE_LIMIT_WAIT)
+    r = _SESSION.get(url, params=params, headers=headers, timeout=_TIMEOUT)
+    if r.status_code == 304 and cached:
+        return cached[1]
+    r.raise_for_status()
+    data = r.json()
+    etag = r.headers.get('ETag')
+    if etag:
+        if len(_ETAG_CACHE) >= _ETAG_CACHE_MAX:
+            _ETAG_CACHE.pop(next(iter(_ETAG_CACHE)), None)
+        _ETAG_CACHE[key] = (etag, data)
+    return data
+
+
+class _PartialResults(dict):
+    """Results cut short by the rate limit; returned to the caller but never cached."""
+
+def _ttl_cache(ttl_seconds: float, maxsize: int = 64):
+    """
+    Memoize an API fetcher by its (hashable) positional args for `ttl_seconds`.
+    Empty and partial results are not cached so a failed request is retried on the next call.
+    """
+    def decorator(func):
+        cache = {}
+
+        @wraps(func)
+        def wrapper(*args):
+            now = time.monotonic()
+            hit = cache.get(args)
+            if hit is not None and now - hit[0] < ttl_seconds:
+                return hit[1]
+            result = func(*args)
+            if result and not isinstance(result, _PartialResults):
+                if len(cache) >= maxsize:
+                    cache.pop(next(iter(cache)), None)  # drop the oldest entry
+                cache[args] = (now, result)
+            return result
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+def parse_iso(dt_str: str) -> datetime:
+    """Parse the API's ISO-8601 timestamps, which use a trailing 'Z' for UTC."""
+    if dt_str.endswith('Z'):
+        dt_str = dt_str[:-1] + '+00:00'
+    return datetime.fromisoformat(dt_str)
+
 def get_upcoming_premier_league_fixtures(limit=20):
     token = os.getenv('FOOTBALL_DATA_API_TOKEN')
     if not token:
@@ -19,32 +130,28 @@ def get_upcoming_premier_league_fixtures(limit=20):
         date_from = today_utc.strftime("%Y-%m-%d")
         date_to = (today_utc + timedelta(days=60)).strftime("%Y-%m-%d")  # look ahead ~2 months
 
-        url = (
-            "https://api.football-data.org/v4/competitions/PL/matches"
-            f"?dateFrom={date_from}&dateTo={date_to}"
-        )
-
-        r = requests.get(url, headers={'X-Auth-Token': token})
-        r.raise_for_status()
-        matches = r.json().get('matches', [])
+        matches = _get_json(
+            "https://api.football-data.org/v4/competitions/PL/matches",
+            token,
+            params={'dateFrom': date_from, 'dateTo': date_to},
+        ).get('matches', [])
 
         # keep only future/near-future match statuses
         allowed_status = {"SCHEDULED", "TIMED"}
-        def parse_iso(dt_str: str) -> datetime:
-            return datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
 
+        # parse each kickoff once; it is used for both sorting and the local time
         upcoming = [
-            m for m in matches
+            (parse_iso(m['utcDate']), m) for m in matches
             if m.get('status') in allowed_status
         ]
 
         # sort by kickoff (utcDate) ascending and take the first `limit`
-        upcoming.sort(key=lambda m: parse_iso(m['utcDate']))
+        upcoming.sort(key=lambda pair: pair[0])
         upcoming = upcoming[:max(0, int(limit))]
 
         cleaned_fixtures = []
-        for m in upcoming:
-            dt_local = parse_iso(m['utcDate']).astimezone(tz)
+        for kickoff, m in upcoming:
+            dt_local = kickoff.astimezone(tz)
             cleaned_fixtures.append({
                 'event_id': m['id'],
                 'date': dt_local.isoformat(),
@@ -62,6 +169,7 @@ def get_upcoming_premier_league_fixtures(limit=20):
         print(f"An error occurred: {e}")
         return []
 
+@_ttl_cache(3600)  # season fixture lists rarely change within the hour
 def get_premier_league_fixtures_by_season(season_year: int | None = None):
     token = os.getenv('FOOTBALL_DATA_API_TOKEN')
     if not token:
@@ -69,12 +177,11 @@ def get_premier_league_fixtures_by_season(season_year: int | None = None):
         return []
 
     try:
-        r = requests.get(
-            f"https://api.football-data.org/v4/competitions/PL/matches?season={season_year}",
-            headers={'X-Auth-Token': token}
-        )
-        r.raise_for_status()
-        matches = r.json().get('matches', [])
+        matches = _get_json(
+            "https://api.football-data.org/v4/competitions/PL/matches",
+            token,
+            params={'season': season_year},
+        ).get('matches', [])
 
         cleaned_fixtures = []
         for m in matches:
@@ -116,10 +223,7 @@ def get_fixture_by_id(fixture_id: int):
         return None
 
     try:
-        url = f"https://api.football-data.org/v4/matches/{fixture_id}"
-        r = requests.get(url, headers={'X-Auth-Token': token})
-        r.raise_for_status()
-        return r.json() # Corrected: return the entire JSON response
+        return _get_json(f"https://api.football-data.org/v4/matches/{fixture_id}", token) # Corrected: return the entire JSON response
     except requests.exceptions.RequestException as e:
         print(f"API request for fixture {fixture_id} failed: {e}")
         return None
@@ -128,9 +232,44 @@ def get_fixture_by_id(fixture_id: int):
         return None
 
 def get_fixtures_by_ids(fixture_ids: list):
+    # Sorted tuple so the same set of IDs always hits the same cache entry
+    return _get_fixtures_by_ids_cached(tuple(sorted({str(fid) for fid in fixture_ids})))
+
+# football-data.org accepts a comma-separated `ids` filter on /v4/matches
+_MATCH_IDS_PER_REQUEST = 50
+# Concurrent per-fixture GETs when the batch request fails
+_FALLBACK_WORKERS = 8
+
+@_ttl_cache(60)  # short TTL: results change while matches are in play
+def _get_fixtures_by_ids_cached(fixture_ids: tuple):
+    token = os.getenv('FOOTBALL_DATA_API_TOKEN')
+    if not token:
+        print("Error: FOOTBALL_DATA_API_TOKEN environment variable not set.")
+        return {}
+
+    # Manually added fixtures carry non-numeric event IDs the API cannot resolve
+    api_ids = [fid for fid in fixture_ids if fid.isdigit()]
     results = {}
-    for fid in fixture_ids:
-        fixture_data = get_fixture_by_id(fid)
-        if fixture_data:
-            results[str(fid)] = fixture_data # Store by string ID for consistency
+    for start in range(0, len(api_ids), _MATCH_IDS_PER_REQUEST):
+        chunk = api_ids[start:start + _MATCH_IDS_PER_REQUEST]
+        try:
+            data = _get_json(
+                "https://api.football-data.org/v4/matches",
+                token,
+                params={'ids': ','.join(chunk)},
+            )
+            for m in data.get('matches', []):
+                results[str(m['id'])] = m # Store by string ID for consistency
+        except _RateLimitWait as e:
+            # Per-fixture fallbacks would hit the same limit; return the chunks fetched so far,
+            # marked so the cache doesn't hand the truncated set out for the next minute
+            print(f"Fixtures {chunk[0]}..{chunk[-1]} skipped: {e}")
+            return _PartialResults(results)
+        except requests.exceptions.RequestException as e:
+            print(f"Batch API request for fixtures {chunk[0]}..{chunk[-1]} failed, fetching one by one: {e}")
+            # I/O-bound, so fan the single-fixture GETs out over the shared session's pool
+            with ThreadPoolExecutor(max_workers=min(_FALLBACK_WORKERS, len(chunk))) as ex:
+                for fid, fixture_data in zip(chunk, ex.map(get_fixture_by_id, chunk)):
+                    if fixture_data:
+                        results[fid] = fixture_data
     return results
@@ -3,6 +3,7 @@ try:
     from .database import db  # when imported as a package
 except ImportError:
     from database import db   # when loaded as a top-level module
+import hashlib
 from datetime import datetime
 
 class Player(db.Model):
@@ -14,6 +15,11 @@ class Player(db.Model):
 
     picks = db.relationship('Pick', backref='player', lazy=True)
 
+    __table_args__ = (
+        # Dashboard, standings and link sends all filter players by status
+        db.Index('ix_player_status', 'status'),
+    )
+
     def __repr__(self):
         return f'<Player {self.name}>'
 
@@ -38,12 +44,26 @@ class Fixture(db.Model):
     event_id = db.Column(db.String(50), unique=True, nullable=False) # From API-Football or manually generated
     home_team = db.Column(db.String(100), nullable=False)
     away_team = db.Column(db.String(100), nullable=False)
+    # normalize_team() of the names, written with the fixture so scoring compares stored values
+    home_team_norm = db.Column(db.String(100), nullable=True, index=True)
+    away_team_norm = db.Column(db.String(100), nullable=True, index=True)
     date = db.Column(db.DateTime, nullable=False)
     time = db.Column(db.String(10), nullable=False)
     home_score = db.Column(db.Integer, nullable=True)
     away_score = db.Column(db.Integer, nullable=True)
     status = db.Column(db.String(20), default='scheduled') # 'scheduled', 'completed'
 
+    __table_args__ = (
+        # Partial index: the unassigned-fixture pickers only ever scan round_id IS NULL rows in date order
+        db.Index('ix_fixture_unassigned_date', 'date',
+                 postgresql_where=db.text('round_id IS NULL'),
+                 sqlite_where=db.text('round_id IS NULL')),
+        # Per-round fixture lists are read in kick-off order
+        db.Index('ix_fixture_round_id_date', 'round_id', 'date'),
+        # Next-round picker groups by PL matchday among unassigned fixtures
+        db.Index('ix_fixture_round_number_unassigned', 'round_number', 'round_id'),
+    )
+
     def __repr__(self):
         return f'<Fixture {self.home_team} vs {self.away_team}>'
 
@@ -56,18 +76,49 @@ class Pick(db.Model):
     is_eliminated = db.Column(db.Boolean, default=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow) # Add timestamp
 
+    __table_args__ = (
+        # Pick lookups are by player within a round (and player across rounds)
+        db.Index('ix_pick_player_round', 'player_id', 'round_id'),
+        # Round summaries and processing read every pick of one round, keyed by player
+        db.Index('ix_pick_round_player', 'round_id', 'player_id'),
+    )
+
+def message_digest(message):
+    """Digest of a message text, stored in SendQueue.message_hash"""
+    return hashlib.blake2b(message.encode('utf-8'), digest_size=16).hexdigest()
+
+def _message_hash(context):
+    """Filled in on insert so duplicates can be caught by index"""
+    return message_digest(context.get_current_parameters()['message'])
+
 class SendQueue(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, db.ForeignKey('player.id'), nullable=True)
     number = db.Column(db.Text, nullable=False)
     message = db.Column(db.Text, nullable=False)
+    message_hash = db.Column(db.String(32), nullable=True, default=_message_hash)
     status = db.Column(db.String(20), nullable=False, default='pending') # pending|in_progress|sent|failed
     attempts = db.Column(db.Integer, nullable=False, default=0)
     last_error = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
     updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
 
-    player = db.relationship('Player')
+    # Every reader of a queue row wants the recipient too; one JOIN instead of a SELECT per row
+    player = db.relationship('Player', lazy='joined')
+
+    __table_args__ = (
+        # Worker polls and queue stats filter by status; link sends look up queued player_ids
+        db.Index('ix_send_queue_status_player', 'status', 'player_id'),
+        # Claims take the oldest pending jobs first (WHERE status='pending' ORDER BY id LIMIT n)
+        db.Index('ix_send_queue_status_id', 'status', 'id'),
+        # The same text to the same number is only queued once until it has been sent (or failed);
+        # claims a worker never finished are returned to pending by _claim_pending_jobs
+        db.Index(
+            'uq_send_queue_unsent_message', 'number', 'message_hash', unique=True,
+            sqlite_where=db.text("status IN ('pending', 'in_progress')"),
+            postgresql_where=db.text("status IN ('pending', 'in_progress')"),
+        ),
+    )
 
     def __repr__(self):
         return f'<SendQueue {self.id} to {self.number} - {self.status}>'
@@ -80,7 +131,7 @@ class WhatsAppSend(db.Model):
     payload = db.Column(db.Text, nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
-    player = db.relationship('Player', backref='whatsapp_sends', lazy=True)
+    player = db.relationship('Player', backref='whatsapp_sends', lazy='joined')
 
     def __repr__(self):
         return f'<WhatsAppSend {self.id} (Player: {self.player_id}) - {self.ok}>'
\ No newline at end of file
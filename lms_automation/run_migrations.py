@@ -1,24 +1,68 @@
 
 from lms_automation.app import app, db
-from sqlalchemy import text
-from lms_automation.models import WhatsAppSend
+from lms_automation.models import message_digest
+from sqlalchemy import text, inspect
+
+def _backfill_message_hash(conn):
+    """Hash the messages still waiting to be sent, so the dedup index covers them too"""
+    seen = set()
+    updates = []
+    for row_id, number, message in conn.execute(text(
+            "SELECT id, number, message FROM send_queue "
+            "WHERE status IN ('pending', 'in_progress') ORDER BY id")):
+        key = (number, message_digest(message))
+        # Duplicates queued before the index existed keep a NULL hash so the index can be built
+        if key not in seen:
+            seen.add(key)
+            updates.append({'id': row_id, 'message_hash': key[1]})
+    if updates:
+        conn.execute(text("UPDATE send_queue SET message_hash = :message_hash WHERE id = :id"), updates)
+
+# Columns added after tables were first created; create_all() never alters existing tables.
+# (table, column, DDL type, optional backfill: SQL expression, or a function run with the connection)
+ADDED_COLUMNS = [
+    ('player', 'unreachable', 'BOOLEAN DEFAULT FALSE', None),
+    ('fixture', 'home_team_norm', 'VARCHAR(100)', 'lower(trim(home_team))'),
+    ('fixture', 'away_team_norm', 'VARCHAR(100)', 'lower(trim(away_team))'),
+    ('send_queue', 'message_hash', 'VARCHAR(32)', _backfill_message_hash),
+]
 
 if __name__ == "__main__":
     with app.app_context():
+        # Also creates any missing tables (e.g. whats_app_send)
         db.create_all()
 
         try:
-            with db.engine.connect() as conn:
-                res = conn.execute(text("PRAGMA table_info('player')")).all()
-                cols = [r[1] for r in res]
-                if 'unreachable' not in cols:
-                    app.logger.info('Adding missing player.unreachable column to database')
-                    conn.execute(text("ALTER TABLE player ADD COLUMN unreachable BOOLEAN DEFAULT 0"))
-                    conn.commit()
-                
-                res = conn.execute(text("PRAGMA table_info('whatsapp_send')")).all()
-                if not res:
-                    app.logger.info('Creating missing whatsapp_send table')
-                    WhatsAppSend.__table__.create(db.engine)
+            # One inspector pass over the affected tables; nothing is altered when the schema is current
+            inspector = inspect(db.engine)
+            existing = {
+                table: {c['name'] for c in inspector.get_columns(table)}
+                for table in {t for t, _, _, _ in ADDED_COLUMNS}
+            }
+            missing = [spec for spec in ADDED_COLUMNS if spec[1] not in existing[spec[0]]]
+
+            if not missing:
+                app.logger.info('DB schema is up to date')
+            else:
+                # Another instance booting at the same time may add the column first; Postgres can
+                # skip it in the DDL itself (SQLite has no ADD COLUMN IF NOT EXISTS)
+                if_not_exists = 'IF NOT EXISTS ' if db.engine.dialect.name == 'postgresql' else ''
+                with db.engine.begin() as conn:
+                    for table, col, ddl, backfill in missing:
+                        app.logger.info('Adding missing %s.%s column to database', table, col)
+                        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {if_not_exists}{col} {ddl}"))
+                        if callable(backfill):
+                            backfill(conn)
+                        elif backfill:
+                            conn.execute(text(f"UPDATE {table} SET {col} = {backfill}"))
         except Exception as e:
             app.logger.exception('Failed to ensure DB schema: %s', e)
+
+        # create_all() skips existing tables, so add any newly declared indexes explicitly.
+        # Each index is tried on its own so one lost race with a concurrent boot doesn't skip the rest.
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(db.engine, checkfirst=True)
+                except Exception as e:
+                    app.logger.exception('Failed to ensure DB index %s: %s', index.name, e)
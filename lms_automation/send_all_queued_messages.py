@@ -3,8 +3,9 @@
 import os
 import sys
 import time
-import random
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv, find_dotenv
 
 # Add the script's directory to the Python path to resolve local imports
@@ -15,23 +16,42 @@ if script_dir not in sys.path:
 from whatsapp_sender import WhatsAppSender
 
 # Load environment variables
-load_dotenv(find_dotenv())
+# The launch scripts export DOTENV_PATH, which saves find_dotenv() walking up the tree
+load_dotenv(os.environ.get("DOTENV_PATH") or find_dotenv())
 
 # --- Configuration ---
 BASE_URL = os.environ.get("BASE_URL")
 WORKER_API_TOKEN = os.environ.get("WORKER_API_TOKEN")
 CHROME_USER_DATA_DIR = os.environ.get("CHROME_USER_DATA_DIR")
+# Optional host:port (e.g. 127.0.0.1:9222): keep one Chrome running between runs instead of relaunching it
+CHROME_DEBUGGER_ADDRESS = os.environ.get("CHROME_DEBUGGER_ADDRESS")
+
+# One keep-alive connection for the fetch and every status report. Only the POSTed reports
+# are retried: the GET of /api/queue/all_pending claims every job, so a repeat after the
+# claim committed would return nothing and strand the first batch in_progress
+session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=2, pool_maxsize=4,
+    max_retries=Retry(
+        total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"POST"}),
+    ),
+)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+session.headers["Authorization"] = f"Bearer {WORKER_API_TOKEN}"
+
+URL_ALL_PENDING = f"{BASE_URL}/api/queue/all_pending"
+URL_HEALTH = f"{BASE_URL}/api/health"
+URL_MARK = f"{BASE_URL}/api/queue/mark"
 
 def get_all_queued_jobs():
     """Fetches all pending messages from the server."""
-    headers = {"Authorization": f"Bearer {WORKER_API_TOKEN}"}
     # This new API endpoint will need to be created in app.py
-    api_url = f"{BASE_URL}/api/queue/all_pending"
-    
-    print(f"Connecting to: {api_url}")
+    print(f"Connecting to: {URL_ALL_PENDING}")
     
     try:
-        response = requests.get(api_url, headers=headers, timeout=15)
+        response = session.get(URL_ALL_PENDING, timeout=15)
         response.raise_for_status()
         jobs = response.json()
         print(f"Found {len(jobs)} pending job(s)")
@@ -42,9 +62,6 @@ def get_all_queued_jobs():
 
 def mark_job_status(job_id, status, error=None):
     """Reports the outcome of a job back to the server."""
-    headers = {"Authorization": f"Bearer {WORKER_API_TOKEN}"}
-    api_url = f"{BASE_URL}/api/queue/mark"
-    
     payload = {"id": job_id, "status": status}
     if error:
         payload["error"] = str(error)
@@ -52,7 +69,7 @@ def mark_job_status(job_id, status, error=None):
     print(f"Reporting job {job_id} as {status}")
         
     try:
-        response = requests.post(api_url, headers=headers, json=payload, timeout=15)
+        response = session.post(URL_MARK, json=payload, timeout=15)
         response.raise_for_status()
         return True
     except requests.exceptions.RequestException as e:
@@ -75,15 +92,15 @@ def main():
     print(f"Configuration loaded:")
     print(f"  BASE_URL: {BASE_URL}")
     print(f"  CHROME_USER_DATA_DIR: {CHROME_USER_DATA_DIR or 'Using temporary directory'}")
+    if CHROME_DEBUGGER_ADDRESS:
+        print(f"  CHROME_DEBUGGER_ADDRESS: {CHROME_DEBUGGER_ADDRESS} (Chrome kept running between runs)")
 
     sender = None
+    jobs = []
+    # Indexes of the jobs whose outcome has been reported; the rest go back to the queue on exit
+    handled = set()
     try:
-        print("Initializing WhatsApp Sender...")
-        sender = WhatsAppSender(user_data_dir=CHROME_USER_DATA_DIR)
-        print("--- WhatsApp Sender Initialized ---")
-        print("Waiting for WhatsApp Web to fully load...")
-        time.sleep(10) # Give WhatsApp Web time to load
-            
+        # Fetch first: with nothing to send, Chrome and WhatsApp Web never have to start
         jobs = get_all_queued_jobs()
     
         if jobs is None:
@@ -94,34 +111,36 @@ def main():
             print("No pending jobs found. Exiting.")
             return
                 
-        print(f"Found {len(jobs)} job(s). Processing...")
-        for job in jobs:
-            job_id = job.get("id")
-            number = job.get("number")
-            message = job.get("message")
-            
-            print(f"  - Sending message to {number} (Job ID: {job_id})")
+        print("Initializing WhatsApp Sender...")
+        sender = WhatsAppSender(user_data_dir=CHROME_USER_DATA_DIR, debugger_address=CHROME_DEBUGGER_ADDRESS)
+        print("--- WhatsApp Sender Initialized ---")
+        print("Waiting for WhatsApp Web to fully load...")
+        time.sleep(10) # Give WhatsApp Web time to load
             
-            try:
-                success, status_message = sender.send_message(number, message)
-                
-                if success:
-                    print(f"    -> Success.")
-                    mark_job_status(job_id, "sent")
-                else:
-                    print(f"    -> Failed: {status_message}")
-                    mark_job_status(job_id, "failed", error=status_message)
-
-                time.sleep(random.randint(5, 15))
-
-            except Exception as e:
-                print(f"    -> CRITICAL ERROR during send: {e}")
-                mark_job_status(job_id, "failed", error=e)
+        print(f"Found {len(jobs)} job(s). Processing...")
+        # Messages to the same number go back to back so they share one chat load
+        jobs.sort(key=lambda job: job.get("number") or "")
+
+        def report(index, success, status_message):
+            handled.add(index)
+            job_id = jobs[index].get("id")
+            if success:
+                print(f"    -> Job {job_id}: Success.")
+                mark_job_status(job_id, "sent")
+            else:
+                print(f"    -> Job {job_id}: Failed: {status_message}")
+                mark_job_status(job_id, "failed", error=status_message)
+
+        sender.send_batch([(job.get("number"), job.get("message")) for job in jobs], on_result=report)
     
     except Exception as e:
         print(f"An error occurred: {e}")
 
     finally:
+        # The fetch claimed every job; hand the unsent ones back instead of leaving them in_progress
+        for index, job in enumerate(jobs or []):
+            if index not in handled:
+                mark_job_status(job.get("id"), "pending")
         if sender:
             print("--- Closing WhatsApp Sender ---")
             sender.close()
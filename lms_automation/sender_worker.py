@@ -4,6 +4,9 @@ import sys
 import time
 import random
 import requests
+from collections import deque
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv, find_dotenv
 
 # Add the script's directory to the Python path to resolve local imports
@@ -16,7 +19,8 @@ from whatsapp_sender import WhatsAppSender
 
 # Load environment variables from .env file
 # Explicitly load from the project root's .env file
-load_dotenv(find_dotenv())
+# The launch scripts export DOTENV_PATH, which saves find_dotenv() walking up the tree
+load_dotenv(os.environ.get("DOTENV_PATH") or find_dotenv())
 
 # --- Configuration ---
 # The BASE_URL of your deployed Flask application
@@ -42,15 +46,46 @@ if not all([BASE_URL, WORKER_API_TOKEN, CHROME_USER_DATA_DIR]):
     exit(1)
 
 
+# Pause after every empty poll: doubles from the base up to the cap, with +/-20% jitter
+EMPTY_POLL_BACKOFF_BASE = 5
+EMPTY_POLL_BACKOFF_CAP = 30
+# Jobs are claimed in batches and buffered locally; top the buffer up when it runs low
+FETCH_LIMIT = 50
+REFILL_THRESHOLD = 10
+# Outcomes are reported together via /api/queue/mark_bulk once this many are waiting,
+# or once the oldest has waited this long
+MARK_BATCH_SIZE = 10
+MARK_FLUSH_SECONDS = 60
+
+# One keep-alive connection to the app for all polls and status reports;
+# gateway errors from a restarting host are retried with backoff. Only POSTs are retried:
+# a GET of /api/queue/next claims jobs, so repeating one whose claim already committed
+# would leave the first batch stuck in_progress. Status reports just set a status again.
+session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=2, pool_maxsize=4,
+    max_retries=Retry(
+        total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"POST"}),
+    ),
+)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+session.headers["Authorization"] = f"Bearer {WORKER_API_TOKEN}"
+
+# Endpoints are fixed for the life of the process
+URL_NEXT = f"{BASE_URL}/api/queue/next"
+URL_MARK_BULK = f"{BASE_URL}/api/queue/mark_bulk"
+
+_pending_marks = []
+_oldest_mark_at = None
+
 def get_jobs(limit=10):
     """Polls the server for the next batch of pending messages."""
-    headers = {"Authorization": f"Bearer {WORKER_API_TOKEN}"}
-    api_url = f"{BASE_URL}/api/queue/next?limit={limit}"
-    
-    print(f"🔗 Connecting to: {api_url}")
+    print(f"🔗 Connecting to: {URL_NEXT}")
     
     try:
-        response = requests.get(api_url, headers=headers, timeout=15)
+        response = session.get(URL_NEXT, params={"limit": limit}, timeout=15)
         print(f"📡 Response status: {response.status_code}")
         response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
         jobs = response.json()
@@ -67,26 +102,39 @@ def get_jobs(limit=10):
         return None
 
 def mark_job_status(job_id, status, error=None):
-    """Reports the outcome of a job back to the server."""
-    headers = {"Authorization": f"Bearer {WORKER_API_TOKEN}"}
-    api_url = f"{BASE_URL}/api/queue/mark"
-    
+    """Records the outcome of a job; it is reported to the server in the next bulk flush."""
+    global _oldest_mark_at
     payload = {"id": job_id, "status": status}
     if error:
         payload["error"] = str(error)
     
-    print(f"📤 Reporting job {job_id} as {status}")
+    print(f"📝 Recording job {job_id} as {status}")
+    _pending_marks.append(payload)
+    if _oldest_mark_at is None:
+        _oldest_mark_at = time.monotonic()
+    if len(_pending_marks) >= MARK_BATCH_SIZE or time.monotonic() - _oldest_mark_at >= MARK_FLUSH_SECONDS:
+        flush_marks()
+
+def flush_marks():
+    """Reports all recorded outcomes in one request. Kept for the next flush if it fails."""
+    global _oldest_mark_at
+    if not _pending_marks:
+        return True
+    
+    print(f"📤 Reporting {len(_pending_marks)} job status(es)")
         
     try:
-        response = requests.post(api_url, headers=headers, json=payload, timeout=15)
+        response = session.post(URL_MARK_BULK, json={"updates": _pending_marks}, timeout=15)
         print(f"📡 Mark status response: {response.status_code}")
         response.raise_for_status()
+        _pending_marks.clear()
+        _oldest_mark_at = None
         return True
     except requests.exceptions.ConnectionError as e:
         print(f"❌ Connection Error: Cannot connect to {BASE_URL} for status update")
         return False
     except requests.exceptions.RequestException as e:
-        print(f"❌ API Error (mark_job_status for job {job_id}): {e}")
+        print(f"❌ API Error (flush_marks): {e}")
         return False
 
 def main_loop():
@@ -118,29 +166,41 @@ def main_loop():
         print("💡 Make sure Chrome is installed and the profile path is correct")
         return
     
-    while True:
-        print("\nPolling for new jobs...")
-        jobs = get_jobs()
-        
-        if jobs is None:
-            # An error occurred in get_jobs, wait before retrying
-            print("Waiting 60 seconds due to API error.")
-            time.sleep(60)
-            continue
-
-        if not jobs:
-            # No jobs in the queue, wait for a bit
-            print("No pending jobs found. Waiting 30 seconds.")
-            time.sleep(30)
-            continue
-            
-        print(f"Found {len(jobs)} job(s). Processing...")
-        for job in jobs:
+    local_jobs = deque()
+    empty_polls = 0
+    try:
+        while True:
+            if len(local_jobs) < REFILL_THRESHOLD:
+                if not local_jobs:
+                    # Report outcomes before pausing for more work
+                    flush_marks()
+                print("\nPolling for new jobs...")
+                jobs = get_jobs(limit=FETCH_LIMIT - len(local_jobs))
+
+                if jobs is None and not local_jobs:
+                    # An error occurred in get_jobs, wait before retrying
+                    print("Waiting 60 seconds due to API error.")
+                    time.sleep(60)
+                    continue
+                local_jobs.extend(jobs or [])
+
+            if not local_jobs:
+                # No jobs in the queue. Always pause: the app serves requests one at a time, so
+                # back-to-back polls would keep it busy for everyone else while the queue is idle
+                delay = min(EMPTY_POLL_BACKOFF_CAP, EMPTY_POLL_BACKOFF_BASE * 2 ** empty_polls)
+                delay *= random.uniform(0.8, 1.2)
+                empty_polls += 1
+                print(f"No pending jobs found. Waiting {delay:.0f} seconds.")
+                time.sleep(delay)
+                continue
+            empty_polls = 0
+
+            job = local_jobs.popleft()
             job_id = job.get("id")
             number = job.get("number")
             message = job.get("message")
             
-            print(f"  - Sending message to {number} (Job ID: {job_id})")
+            print(f"  - Sending message to {number} (Job ID: {job_id}, {len(local_jobs)} buffered)")
             
             try:
                 # The core sending logic
@@ -163,10 +223,11 @@ def main_loop():
                 # Catch any unexpected exceptions during the sending process
                 print(f"    -> CRITICAL ERROR during send: {e}")
                 mark_job_status(job_id, "failed", error=e)
-        
-        # Wait a shorter time before polling for the next batch
-        print("Batch complete. Waiting 5 seconds.")
-        time.sleep(5)
+    finally:
+        # Hand claimed but unsent jobs back to the queue instead of leaving them in_progress
+        _pending_marks.extend({"id": job.get("id"), "status": "pending"} for job in local_jobs)
+        # Don't lose recorded outcomes on Ctrl+C / shutdown
+        flush_marks()
 
 if __name__ == "__main__":
     print("--- Starting Local WhatsApp Worker ---")
@@ -14,7 +14,13 @@ import time
 import random
 import signal
 import logging
+import queue
+import threading
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv, find_dotenv
 
 # Configure logging
@@ -41,14 +47,34 @@ except ImportError:
     from whatsapp_sender import WhatsAppSender as WhatsAppSenderEnhanced
 
 # Load environment variables
-load_dotenv(find_dotenv())
+# The launch scripts export DOTENV_PATH, which saves find_dotenv() walking up the tree
+load_dotenv(os.environ.get("DOTENV_PATH") or find_dotenv())
 
 class WhatsAppWorker:
+    # Pause after every empty poll: doubles from the base up to the cap, with +/-20% jitter so
+    # several workers don't poll in step
+    empty_poll_backoff_base = 5
+    empty_poll_backoff_cap = 30
+    # Jobs are claimed in batches and buffered locally; top the buffer up when it runs low
+    fetch_limit = 50
+    refill_threshold = 10
+    # Outcomes are reported together via /api/queue/mark_bulk once this many are waiting,
+    # or once the oldest has waited this long
+    mark_batch_size = 10
+    mark_flush_seconds = 60
+
     def __init__(self):
         self.running = True
         self.sender = None
+        # Held while the sender is created, replaced or used; start-up runs on a background thread
+        self._sender_lock = threading.Lock()
+        self._sender_startup = None
         self.health_check_interval = 300  # 5 minutes
         self.last_health_check = 0
+        # API and browser health are tracked apart so a network blip doesn't restart Chrome
+        self._last_api_healthy = True
+        self._last_sender_healthy = True
+        self._jobs_since_health_check = 0
         self.consecutive_failures = 0
         self.max_consecutive_failures = 5
         
@@ -56,6 +82,11 @@ class WhatsAppWorker:
         self.base_url = os.environ.get("BASE_URL")
         self.worker_token = os.environ.get("WORKER_API_TOKEN")
         self.chrome_data_dir = os.environ.get("CHROME_USER_DATA_DIR")
+        # Optional extra Chrome profiles (os.pathsep-separated); with more than one, each profile
+        # gets its own sender thread fed from a shared job queue
+        self.chrome_data_dirs = [
+            d for d in os.environ.get("CHROME_USER_DATA_DIRS", "").split(os.pathsep) if d
+        ] or [self.chrome_data_dir]
         self.headless = os.environ.get("CHROME_HEADLESS", "true").lower() == "true"
         
         # Validate configuration
@@ -67,8 +98,40 @@ class WhatsAppWorker:
         logger.info(f"BASE_URL: {self.base_url}")
         logger.info(f"WORKER_TOKEN: {'*' * 10}...")
         logger.info(f"CHROME_DATA_DIR: {self.chrome_data_dir}")
+        if len(self.chrome_data_dirs) > 1:
+            logger.info(f"CHROME_DATA_DIRS: {len(self.chrome_data_dirs)} profiles")
         logger.info(f"HEADLESS: {self.headless}")
         logger.info("=====================================")
+
+        # One keep-alive connection to the app for all polls and status reports;
+        # gateway errors from a restarting host are retried with backoff. Only POSTs are
+        # retried: a GET of /api/queue/next claims jobs, so repeating one whose claim already
+        # committed would leave the first batch stuck in_progress
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=2, pool_maxsize=4,
+            max_retries=Retry(
+                total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+                allowed_methods=frozenset({"POST"}),
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {self.worker_token}"
+        self.url_next = f"{self.base_url}/api/queue/next"
+        self.url_mark_bulk = f"{self.base_url}/api/queue/mark_bulk"
+        self.url_health = f"{self.base_url}/api/health"
+        self.local_jobs = deque()
+        self._pending_marks = []
+        self._oldest_mark_at = None
+        # Sender threads record outcomes concurrently when several profiles are configured
+        self._marks_lock = threading.RLock()
+        self.job_queue = queue.Queue()
+        # Status flushes and buffer top-ups run here so their round trips overlap the (much
+        # longer) browser sends instead of stalling the send loop
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="queue-io")
+        self._refill = None
+        self._empty_polls = 0
         
         # Setup signal handlers for graceful shutdown
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -81,6 +144,10 @@ class WhatsAppWorker:
 
     def initialize_sender(self):
         """Initialize or reinitialize the WhatsApp sender"""
+        with self._sender_lock:
+            return self._initialize_sender()
+
+    def _initialize_sender(self):
         if self.sender:
             try:
                 self.sender.close()
@@ -103,13 +170,33 @@ class WhatsAppWorker:
             self.consecutive_failures += 1
             return False
 
+    def _sender_started(self):
+        """Block until the background start-up has finished; False if it failed"""
+        if self._sender_startup is None:
+            return True
+        started = self._sender_startup.result()
+        self._sender_startup = None
+        return started
+
+    @staticmethod
+    def _by_number(jobs):
+        """Order a fetched batch so messages to the same number go back to back (one chat load)"""
+        return sorted(jobs, key=lambda job: job.get("number") or "")
+
+    def _sleep_after_empty_poll(self):
+        """Back off exponentially (with jitter) over consecutive empty polls"""
+        delay = min(
+            self.empty_poll_backoff_cap,
+            self.empty_poll_backoff_base * 2 ** self._empty_polls,
+        ) * random.uniform(0.8, 1.2)
+        self._empty_polls += 1
+        logger.info(f"No pending jobs, waiting {delay:.0f} seconds...")
+        time.sleep(delay)
+
     def get_jobs(self, limit=10):
         """Get pending jobs from the API"""
-        headers = {"Authorization": f"Bearer {self.worker_token}"}
-        api_url = f"{self.base_url}/api/queue/next?limit={limit}"
-        
         try:
-            response = requests.get(api_url, headers=headers, timeout=15)
+            response = self.session.get(self.url_next, params={"limit": limit}, timeout=15)
             response.raise_for_status()
             jobs = response.json()
             logger.info(f"📥 Retrieved {len(jobs)} pending job(s)")
@@ -123,22 +210,40 @@ class WhatsAppWorker:
             return None
 
     def mark_job_status(self, job_id, status, error=None):
-        """Mark job status in the API"""
-        headers = {"Authorization": f"Bearer {self.worker_token}"}
-        api_url = f"{self.base_url}/api/queue/mark"
-        
+        """Record a job outcome; it is reported to the API in the next bulk flush"""
         payload = {"id": job_id, "status": status}
         if error:
             payload["error"] = str(error)
-        
+
+        with self._marks_lock:
+            self._pending_marks.append(payload)
+            if self._oldest_mark_at is None:
+                self._oldest_mark_at = time.monotonic()
+            if (len(self._pending_marks) >= self.mark_batch_size
+                    or time.monotonic() - self._oldest_mark_at >= self.mark_flush_seconds):
+                self._io.submit(self.flush_marks)
+
+    def flush_marks(self):
+        """Report all recorded outcomes in one request; kept for the next flush if it fails"""
+        # Take the batch under the lock but post it outside, so senders recording outcomes
+        # don't wait on the round trip (and its retries)
+        with self._marks_lock:
+            if not self._pending_marks:
+                return True
+            batch, self._pending_marks = self._pending_marks, []
+            oldest, self._oldest_mark_at = self._oldest_mark_at, None
         try:
-            response = requests.post(api_url, headers=headers, json=payload, timeout=15)
+            response = self.session.post(self.url_mark_bulk, json={"updates": batch}, timeout=15)
             response.raise_for_status()
-            logger.info(f"📤 Marked job {job_id} as {status}")
+            logger.info(f"📤 Reported {len(batch)} job status(es)")
             return True
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"❌ Failed to mark job {job_id}: {e}")
+            logger.error(f"❌ Failed to report {len(batch)} job status(es): {e}")
+            with self._marks_lock:
+                # Back in front of anything recorded meanwhile, still dated by the oldest
+                self._pending_marks[:0] = batch
+                self._oldest_mark_at = oldest
             return False
 
     def health_check(self):
@@ -149,18 +254,42 @@ class WhatsAppWorker:
         
         self.last_health_check = current_time
         
-        if not self.sender:
+        # Cheap API probe first; when the app is unreachable the browser isn't the problem
+        self._last_api_healthy = self.api_healthy()
+        if not self._last_api_healthy:
+            logger.warning("💊 API unreachable, skipping browser check")
+            return True
+        
+        # Idle since the last check: send_message re-checks the session before its next send anyway
+        if not self._jobs_since_health_check:
+            return True
+        self._jobs_since_health_check = 0
+        self._last_sender_healthy = self.check_sender(self.sender)
+        return self._last_sender_healthy
+
+    def api_healthy(self):
+        """HEAD the app's /api/health endpoint"""
+        try:
+            return self.session.head(self.url_health, timeout=5).ok
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"💊 API health probe failed: {e}")
+            return False
+
+    @staticmethod
+    def check_sender(sender):
+        """Check one sender's WhatsApp Web session, attempting recovery if it is unhealthy"""
+        if not sender:
             logger.warning("💊 No sender instance for health check")
             return False
         
         try:
-            healthy = self.sender.check_session_health()
+            healthy = sender.check_session_health()
             if healthy:
                 logger.info("💊 Health check passed")
                 return True
             else:
                 logger.warning("💊 Health check failed, attempting recovery...")
-                if self.sender.recover_session():
+                if sender.recover_session():
                     logger.info("💊 Session recovery successful")
                     return True
                 else:
@@ -173,6 +302,17 @@ class WhatsAppWorker:
 
     def process_job(self, job):
         """Process a single job"""
+        self._jobs_since_health_check += 1
+        with self._sender_lock:
+            sent, crashed = self.send_job(self.sender, job)
+        if sent:
+            self.consecutive_failures = 0
+        elif crashed:
+            self.consecutive_failures += 1
+        return sent
+
+    def send_job(self, sender, job):
+        """Send one job with the given sender and record its outcome; returns (sent, crashed)"""
         job_id = job.get("id")
         phone_number = job.get("number")
         message = job.get("message")
@@ -180,37 +320,38 @@ class WhatsAppWorker:
         logger.info(f"📤 Processing job {job_id}: {phone_number}")
         
         try:
-            success, result = self.sender.send_message(phone_number, message)
+            success, result = sender.send_message(phone_number, message)
             
             if success:
                 logger.info(f"✅ Job {job_id} completed successfully")
                 self.mark_job_status(job_id, "sent")
-                self.consecutive_failures = 0
-                return True
+                return True, False
             else:
                 logger.error(f"❌ Job {job_id} failed: {result}")
                 self.mark_job_status(job_id, "failed", error=result)
-                return False
+                return False, False
                 
         except Exception as e:
             logger.error(f"❌ Critical error processing job {job_id}: {e}")
             self.mark_job_status(job_id, "failed", error=str(e))
-            self.consecutive_failures += 1
-            return False
+            return False, True
 
     def run(self):
         """Main worker loop"""
         logger.info("🚀 Starting enhanced WhatsApp worker...")
+        if len(self.chrome_data_dirs) > 1:
+            return self.run_pool()
         
-        # Initialize sender
-        if not self.initialize_sender():
-            logger.error("Failed to initialize sender, exiting")
-            return
+        # Bring the browser up in the background so the first queue poll overlaps its cold start;
+        # the loop only waits for it once a job is ready to send
+        startup = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sender-startup")
+        self._sender_startup = startup.submit(self.initialize_sender)
+        startup.shutdown(wait=False)
         
         while self.running:
             try:
-                # Health check
-                if not self.health_check():
+                # Health check (the sender is not checked until it has started)
+                if self._sender_startup is None and not self.health_check():
                     logger.warning("Health check failed, reinitializing sender...")
                     if not self.initialize_sender():
                         logger.error("Failed to reinitialize sender")
@@ -225,35 +366,51 @@ class WhatsAppWorker:
                         time.sleep(300)  # Wait 5 minutes before trying again
                         continue
                 
-                # Get jobs
-                jobs = self.get_jobs()
+                # Collect a background top-up once it has landed (or once there is nothing else to send)
+                if self._refill is not None and (self._refill.done() or not self.local_jobs):
+                    self.local_jobs.extend(self._by_number(self._refill.result() or []))
+                    self._refill = None
                 
-                if jobs is None:
-                    logger.warning("API error, waiting 60 seconds...")
-                    time.sleep(60)
-                    continue
+                # Top up the local job buffer when it runs low
+                if self._refill is None and len(self.local_jobs) < self.refill_threshold:
+                    if self.local_jobs:
+                        # Fetch in the background while the buffered jobs are sent
+                        self._refill = self._io.submit(
+                            self.get_jobs, limit=self.fetch_limit - len(self.local_jobs)
+                        )
+                    else:
+                        # The batch is done; the next message loads its chat fresh
+                        if self._sender_startup is None and hasattr(self.sender, "flush_chat"):
+                            self.sender.flush_chat()
+                        # Report outcomes before pausing for more work
+                        self.flush_marks()
+                        jobs = self.get_jobs(limit=self.fetch_limit)
+
+                        if jobs is None:
+                            logger.warning("API error, waiting 60 seconds...")
+                            time.sleep(60)
+                            continue
+                        self.local_jobs.extend(self._by_number(jobs))
                 
-                if not jobs:
-                    logger.info("No pending jobs, waiting 5 seconds...")  # Reduced from 30 to 5 seconds
-                    time.sleep(5)
+                if not self.local_jobs:
+                    # Always pause: the app serves requests one at a time, so back-to-back polls
+                    # would keep it busy for everyone else while the queue is idle
+                    self._sleep_after_empty_poll()
                     continue
+                self._empty_polls = 0
                 
-                # Process jobs
-                logger.info(f"Processing {len(jobs)} job(s)...")
-                for job in jobs:
-                    if not self.running:
-                        break
-                    
-                    self.process_job(job)
-                    
-                    # Random delay between messages (anti-detection)
-                    if len(jobs) > 1:  # Only add delay if multiple jobs
-                        delay = random.randint(5, 15)  # Reduced from 20-60 to 5-15 seconds
-                        logger.info(f"💤 Anti-detection delay: {delay}s...")
-                        time.sleep(delay)
+                if not self._sender_started():
+                    logger.error("Failed to initialize sender, exiting")
+                    break
+                
+                # Process the next buffered job
+                self.process_job(self.local_jobs.popleft())
                 
-                # Brief pause before next poll
-                time.sleep(5)
+                # Random delay between messages (anti-detection)
+                if self.local_jobs:  # Only add delay if more jobs are waiting
+                    delay = random.randint(5, 15)  # Reduced from 20-60 to 5-15 seconds
+                    logger.info(f"💤 Anti-detection delay: {delay}s...")
+                    time.sleep(delay)
                 
             except KeyboardInterrupt:
                 logger.info("Received keyboard interrupt, shutting down...")
@@ -264,6 +421,18 @@ class WhatsAppWorker:
         
         # Cleanup
         logger.info("🔒 Shutting down worker...")
+        if self._refill is not None:
+            self.local_jobs.extend(self._refill.result() or [])
+            self._refill = None
+        # Hand claimed but unsent jobs back to the queue instead of leaving them in_progress
+        with self._marks_lock:
+            self._pending_marks.extend({"id": job.get("id"), "status": "pending"} for job in self.local_jobs)
+        self.local_jobs.clear()
+        # Let a background flush finish first; a batch it fails to report is retried here
+        self._io.shutdown(wait=True)
+        self.flush_marks()
+        # Let an unfinished start-up complete so its browser is closed below
+        self._sender_started()
         if self.sender:
             try:
                 self.sender.close()
@@ -272,6 +441,141 @@ class WhatsAppWorker:
         
         logger.info("✅ Worker shutdown complete")
 
+    def run_pool(self):
+        """
+        Multi-profile loop: this thread only claims jobs into job_queue, and one SenderLane per
+        Chrome profile sends them with its own anti-detection delay.
+        """
+        lanes = [SenderLane(self, data_dir, i) for i, data_dir in enumerate(self.chrome_data_dirs, 1)]
+        for lane in lanes:
+            lane.start()
+        
+        while self.running:
+            try:
+                if not any(lane.is_alive() for lane in lanes):
+                    logger.error("All sender lanes have stopped, exiting")
+                    break
+                
+                buffered = self.job_queue.qsize()
+                if buffered >= self.refill_threshold:
+                    time.sleep(1)
+                    continue
+                if not buffered:
+                    # Report outcomes before pausing for more work
+                    self.flush_marks()
+                jobs = self.get_jobs(limit=self.fetch_limit - buffered)
+                if jobs is None:
+                    logger.warning("API error, waiting 60 seconds...")
+                    time.sleep(60)
+                    continue
+                for job in jobs:
+                    self.job_queue.put(job)
+                if jobs:
+                    self._empty_polls = 0
+                elif buffered:
+                    # Lanes are still busy with the buffer; don't re-poll an empty queue back to back
+                    time.sleep(5)
+                else:
+                    self._sleep_after_empty_poll()
+                
+            except KeyboardInterrupt:
+                logger.info("Received keyboard interrupt, shutting down...")
+                break
+            except Exception as e:
+                logger.error(f"Unexpected error in pool loop: {e}")
+                time.sleep(30)
+        
+        logger.info("🔒 Shutting down worker pool...")
+        self.running = False
+        for lane in lanes:
+            lane.join()
+        # Hand claimed but unsent jobs back to the queue instead of leaving them in_progress
+        while True:
+            try:
+                job = self.job_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.mark_job_status(job.get("id"), "pending")
+        # Let a background flush finish first; a batch it fails to report is retried here
+        self._io.shutdown(wait=True)
+        self.flush_marks()
+        logger.info("✅ Worker shutdown complete")
+
+
+class SenderLane(threading.Thread):
+    """One Chrome profile sending jobs from the worker's shared queue"""
+
+    def __init__(self, worker, user_data_dir, index):
+        super().__init__(name=f"sender-lane-{index}", daemon=True)
+        self.worker = worker
+        self.user_data_dir = user_data_dir
+        self.sender = None
+        self.consecutive_failures = 0
+        self.last_health_check = time.time()
+
+    def start_sender(self):
+        """Initialize or reinitialize this lane's sender"""
+        self.close_sender()
+        try:
+            logger.info(f"🚀 [{self.name}] Initializing WhatsApp sender for {self.user_data_dir}...")
+            self.sender = WhatsAppSenderEnhanced(
+                user_data_dir=self.user_data_dir,
+                headless=self.worker.headless,
+                max_retries=3
+            )
+            self.consecutive_failures = 0
+            return True
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] Failed to initialize WhatsApp sender: {e}")
+            return False
+
+    def close_sender(self):
+        if self.sender:
+            try:
+                self.sender.close()
+            except Exception as e:
+                logger.warning(f"[{self.name}] Error closing sender: {e}")
+            self.sender = None
+
+    def ready(self):
+        """Periodic health check, and a restart after too many failures in a row"""
+        if time.time() - self.last_health_check >= self.worker.health_check_interval:
+            self.last_health_check = time.time()
+            if not self.worker.check_sender(self.sender):
+                return self.start_sender()
+        if self.consecutive_failures >= self.worker.max_consecutive_failures:
+            logger.error(f"[{self.name}] Too many consecutive failures, reinitializing...")
+            return self.start_sender()
+        return True
+
+    def run(self):
+        if not self.start_sender():
+            logger.error(f"[{self.name}] Sender lane stopped")
+            return
+        
+        while self.worker.running:
+            try:
+                job = self.worker.job_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            
+            if not self.ready():
+                # Leave the job for another lane (or for release at shutdown) and stop this one
+                self.worker.job_queue.put(job)
+                logger.error(f"[{self.name}] Sender lane stopped")
+                break
+            
+            sent, crashed = self.worker.send_job(self.sender, job)
+            if sent:
+                self.consecutive_failures = 0
+            elif crashed:
+                self.consecutive_failures += 1
+            
+            # Per-profile anti-detection delay
+            time.sleep(random.randint(5, 15))
+        
+        self.close_sender()
+
 
 def main():
     """Main entry point"""
@@ -9,32 +9,34 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from app import is_valid_phone_number, to_e164_digits
 
+# (input, expected valid, expected E.164 form)
+TEST_CASES = [
+    # Valid UK numbers
+    ("447545851594", True, "+447545851594"),  # Your number
+    ("07545851594", True, "+447545851594"),   # UK local format
+    ("+447545851594", True, "+447545851594"),  # Already international
+    ("44 7545 851594", True, "+447545851594"), # With spaces
+
+    # Valid international numbers  
+    ("1234567890", True, "+1234567890"),      # 10 digits
+    ("+33123456789", True, "+33123456789"),   # French
+
+    # Invalid numbers
+    ("", False, ""),                          # Empty
+    ("123", False, ""),                       # Too short
+    ("12345678901234567890", False, ""),      # Too long
+    ("07545", False, ""),                     # UK format too short
+    ("abc123def", False, ""),                 # Letters (too short after extraction)
+    ("٠٧٥٤٥٨٥١٥٩٤", False, ""),               # Non-ASCII (Arabic-Indic) digits
+]
+
 def test_phone_numbers():
     """Test various phone number formats"""
     
-    test_cases = [
-        # Valid UK numbers
-        ("447545851594", True, "+447545851594"),  # Your number
-        ("07545851594", True, "+447545851594"),   # UK local format
-        ("+447545851594", True, "+447545851594"),  # Already international
-        ("44 7545 851594", True, "+447545851594"), # With spaces
-        
-        # Valid international numbers  
-        ("1234567890", True, "+1234567890"),      # 10 digits
-        ("+33123456789", True, "+33123456789"),   # French
-        
-        # Invalid numbers
-        ("", False, ""),                          # Empty
-        ("123", False, ""),                       # Too short
-        ("12345678901234567890", False, ""),      # Too long
-        ("07545", False, ""),                     # UK format too short
-        ("abc123def", False, ""),                 # Letters (too short after extraction)
-    ]
-    
     print("🧪 Testing phone number validation...")
     
     all_passed = True
-    for phone, expected_valid, expected_e164 in test_cases:
+    for phone, expected_valid, expected_e164 in TEST_CASES:
         is_valid = is_valid_phone_number(phone)
         
         if expected_valid:
@@ -5,10 +5,64 @@ This script helps test the WhatsApp sender functionality
 """
 
 import os
+import sys
+from unittest import mock
 from dotenv import load_dotenv
 from whatsapp_sender import WhatsAppSender
 
-def test_whatsapp_sender():
+def test_send_message_offline():
+    """Drive send_message against a mocked WebDriver: no Chrome, no network, no pauses"""
+    print("🧪 Testing WhatsApp sender with a mocked browser...")
+    
+    driver = mock.MagicMock()
+    driver.current_url = "https://web.whatsapp.com/"
+    # Every lookup finds a visible, enabled element (chat box and send button alike)
+    send_button = mock.MagicMock()
+    send_button.is_displayed.return_value = True
+    send_button.is_enabled.return_value = True
+    driver.find_element.return_value = send_button
+    # No outgoing messages before a send; afterwards the newest one carries the sent tick
+    driver.execute_script.side_effect = lambda script, *args: True if args else 0
+    
+    with mock.patch("whatsapp_sender.time.sleep"):
+        sender = WhatsAppSender(driver=driver)
+        sender.pre_click_delay = (0, 0)
+        success, result = sender.send_message("+447123456789", "Hello & welcome")
+        opened_url = driver.get.call_args
+        tick_checked = driver.execute_script.call_args is not None and driver.execute_script.call_args.args[1:] == (0,)
+        
+        # A batch reuses the chat that is already open and only loads a new one for a new number
+        sender.batch_delay = (0, 0)
+        driver.get.reset_mock()
+        batch = sender.send_batch([("+447123456789", "Line 1\nLine 2"), ("+447000000000", "Hi")])
+    
+    expected_url = "https://web.whatsapp.com/send?phone=447123456789&text=Hello%20%26%20welcome"
+    checks = [
+        ("message reported sent", success),
+        ("chat opened with encoded message", opened_url == mock.call(expected_url)),
+        ("send button clicked", send_button.click.called),
+        ("waited for the sent tick", tick_checked),
+        ("batch sent both messages", batch == [(True, "Message sent successfully.")] * 2),
+        ("batch loaded only the new chat", driver.get.call_count == 1),
+        ("number without + rejected", _raises(ValueError, sender.send_message, "447123456789", "x")),
+    ]
+    
+    all_passed = True
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+        all_passed = all_passed and bool(ok)
+    if not all_passed:
+        print(f"   send_message returned: {success}, {result}")
+    return all_passed
+
+def _raises(exc_type, func, *args):
+    try:
+        func(*args)
+    except exc_type:
+        return True
+    return False
+
+def test_whatsapp_sender(copy_profile=False):
     # Load environment variables
     load_dotenv()
     
@@ -24,7 +78,7 @@ def test_whatsapp_sender():
     
     try:
         # Initialize sender (this will open Chrome and load WhatsApp Web)
-        sender = WhatsAppSender(user_data_dir=chrome_profile)
+        sender = WhatsAppSender(user_data_dir=chrome_profile, copy_profile=copy_profile)
         
         print("\n✅ WhatsApp sender initialized successfully!")
         print("💡 You should see WhatsApp Web loaded in the Chrome window")
@@ -57,6 +111,11 @@ def test_whatsapp_sender():
     return True
 
 if __name__ == "__main__":
-    success = test_whatsapp_sender()
+    # --offline runs only the mocked check (e.g. in CI); the default is the interactive live test.
+    # --copy-profile runs the live test on a copy of the profile, e.g. while the worker is using it
+    if "--offline" in sys.argv:
+        success = test_send_message_offline()
+    else:
+        success = test_whatsapp_sender(copy_profile="--copy-profile" in sys.argv)
     if not success:
         exit(1)
\ No newline at end of file
@@ -4,9 +4,12 @@ Update database schema for hybrid WhatsApp system
 This script helps migrate from the old schema to the new simplified schema
 """
 
+import hashlib
 import os
+import shutil
 import sys
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.schema import CreateTable
 
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(__file__))
@@ -15,39 +18,73 @@ from database import db
 from models import *
 from app import app
 
+# Hash of the last schema this script applied, so repeat runs (CI, dev restarts) skip the DDL
+SCHEMA_HASH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.schema_hash')
+# Pristine SQLite database copied into place by --reset instead of re-running the migrations
+GOLDEN_DB_PATH = os.environ.get('GOLDEN_DB_PATH') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'lms_golden.db')
+
+def schema_hash(engine):
+    """SHA-256 of the models' CREATE TABLE DDL for this database"""
+    ddl = "\n".join(str(CreateTable(t).compile(engine)) for t in db.metadata.sorted_tables)
+    # Key on the database too, so pointing DATABASE_URL elsewhere doesn't reuse another DB's hash
+    key = engine.url.render_as_string(hide_password=True) + "\n" + ddl
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _sqlite_path(engine):
+    """File path of a file-backed SQLite database, else None"""
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return None
+    return engine.url.database
+
+def schema_up_to_date(engine, h):
+    try:
+        with open(SCHEMA_HASH_PATH) as f:
+            if f.read().strip() != h:
+                return False
+    except OSError:
+        return False
+    # A deleted dev database must be rebuilt even if the hash matches
+    path = _sqlite_path(engine)
+    return path is None or os.path.exists(path)
+
 def update_schema():
     """Update the database schema to match the new models"""
     
     with app.app_context():
+        engine = db.engine
+        h = schema_hash(engine)
+        if schema_up_to_date(engine, h):
+            print("✅ Schema up-to-date")
+            return True
+
         print("🔄 Updating database schema...")
         
         try:
-            # Create all tables
-            db.create_all()
-            print("✅ Database tables created/updated")
-            
-            # Check if we need to migrate Round table data
-            engine = db.get_engine()
-            
-            # Check if old columns exist
-            try:
-                result = engine.execute(text("SELECT game_round_number FROM round LIMIT 1"))
-                # If we get here, old schema exists, need to migrate
-                print("📦 Migrating Round table data...")
-                
-                # Migrate data from old columns to new
-                engine.execute(text("""
-                    UPDATE round 
-                    SET round_number = game_round_number 
-                    WHERE round_number IS NULL
-                """))
-                
-                print("✅ Round table data migrated")
+            # One connection and transaction for the whole update
+            with engine.begin() as conn:
+                # Create all tables
+                db.metadata.create_all(bind=conn)
+                print("✅ Database tables created/updated")
                 
-            except Exception as e:
-                # Old columns don't exist, probably already migrated or new install
-                print("ℹ️  No migration needed for Round table")
+                # Migrate Round table data if the old column is still there
+                if 'game_round_number' in {c['name'] for c in inspect(conn).get_columns('round')}:
+                    print("📦 Migrating Round table data...")
+                    
+                    # Migrate data from old columns to new
+                    conn.execute(text("""
+                        UPDATE round 
+                        SET round_number = game_round_number 
+                        WHERE round_number IS NULL
+                    """))
+                    
+                    print("✅ Round table data migrated")
+                else:
+                    # Old columns don't exist, probably already migrated or new install
+                    print("ℹ️  No migration needed for Round table")
             
+            with open(SCHEMA_HASH_PATH, 'w') as f:
+                f.write(h)
             print("🎉 Schema update completed successfully!")
             
         except Exception as e:
@@ -56,8 +93,43 @@ def update_schema():
             
     return True
 
+def reset_dev_db():
+    """Replace the local SQLite database with the golden copy, building the golden copy if missing"""
+
+    with app.app_context():
+        path = _sqlite_path(db.engine)
+        if path is None:
+            print("❌ --reset only works with a file-backed SQLite database")
+            return False
+        db.engine.dispose()
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    # The stored hash describes the database just removed, not whatever replaces it
+    if os.path.exists(SCHEMA_HASH_PATH):
+        os.remove(SCHEMA_HASH_PATH)
+
+    if os.path.exists(GOLDEN_DB_PATH):
+        shutil.copyfile(GOLDEN_DB_PATH, path)
+        print(f"✅ Database reset from {GOLDEN_DB_PATH}")
+        # The copy's schema may be older than the models; this is a no-op when it isn't
+        return update_schema()
+
+    if not update_schema():
+        return False
+    with app.app_context():
+        # Fold the WAL back into the main file so the copy is complete
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        db.engine.dispose()
+    shutil.copyfile(path, GOLDEN_DB_PATH)
+    print(f"✅ Saved golden database to {GOLDEN_DB_PATH}")
+    return True
+
 if __name__ == "__main__":
-    if update_schema():
+    ok = reset_dev_db() if '--reset' in sys.argv[1:] else update_schema()
+    if ok:
         print("\n✅ Database is ready for the hybrid WhatsApp system!")
     else:
         print("\n❌ Schema update failed. Please check the errors above.")
@@ -1,22 +1,205 @@
 import os
 import time
 import random
+import socket
 import tempfile
 import shutil
+from functools import lru_cache
+from urllib.parse import quote
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, each process may resolve the driver itself
+    fcntl = None
+
+# Driver path resolved by webdriver-manager, shared across processes (parallel workers, test runs)
+CHROMEDRIVER_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'lms_whatsapp', 'chromedriver_path')
+# Re-ask webdriver-manager after this long, so a Chrome auto-update gets a matching driver
+CHROMEDRIVER_CACHE_MAX_AGE = 24 * 3600
+
+def _cached_chromedriver_path():
+    try:
+        if time.time() - os.path.getmtime(CHROMEDRIVER_CACHE) > CHROMEDRIVER_CACHE_MAX_AGE:
+            return None
+        with open(CHROMEDRIVER_CACHE) as f:
+            path = f.read().strip()
+    except OSError:
+        return None
+    return path if path and os.path.exists(path) else None
+
+@lru_cache(maxsize=1)
+def chromedriver_path():
+    """
+    Resolve chromedriver once per process; later senders (restarts, extra profiles, test runs)
+    skip webdriver-manager's version lookup and download check. CHROMEDRIVER_PATH pins a driver,
+    SELENIUM_MANAGER=1 returns None so Selenium's own driver manager resolves it. Otherwise the
+    webdriver-manager result is shared through CHROMEDRIVER_CACHE, and a file lock keeps
+    processes starting together from downloading the same driver at once.
+    """
+    pinned = os.environ.get('CHROMEDRIVER_PATH')
+    if pinned and os.path.exists(pinned):
+        return pinned
+    if os.environ.get('SELENIUM_MANAGER') == '1':
+        return None
+
+    path = _cached_chromedriver_path()
+    if path:
+        return path
+    os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE), exist_ok=True)
+    with open(CHROMEDRIVER_CACHE + '.lock', 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        # Another process may have resolved it while we waited for the lock
+        path = _cached_chromedriver_path()
+        if path:
+            return path
+        from webdriver_manager.chrome import ChromeDriverManager
+        path = ChromeDriverManager().install()
+        with open(CHROMEDRIVER_CACHE, 'w') as f:
+            f.write(path)
+    return path
+
+# Outgoing message rows in the open chat, and a check that a row beyond the first `arguments[0]`
+# carries the tick WhatsApp Web shows once its server has the message (a clock while queued)
+_OUTGOING_COUNT_JS = "return document.querySelectorAll('.message-out').length;"
+_NEWEST_OUTGOING_SENT_JS = """
+    const out = document.querySelectorAll('.message-out');
+    return out.length > arguments[0] &&
+        !!out[out.length - 1].querySelector('[data-icon="msg-check"], [data-icon="msg-dblcheck"]');
+"""
+
+def outgoing_count(driver):
+    """Outgoing messages in the open chat; take it just before clicking send, for wait_until_sent"""
+    try:
+        return driver.execute_script(_OUTGOING_COUNT_JS) or 0
+    except WebDriverException:
+        return 0
+
+def wait_until_sent(wait, outgoing_before):
+    """
+    Wait until a message newer than the first `outgoing_before` shows the sent tick, instead of
+    sleeping a fixed time. False if `wait` times out first or the page can't be read.
+    """
+    try:
+        wait.until(lambda driver: driver.execute_script(_NEWEST_OUTGOING_SENT_JS, outgoing_before))
+        return True
+    except WebDriverException:  # includes TimeoutException
+        return False
+
+def add_lean_options(chrome_options, block_images=False):
+    """
+    Turn off Chrome work WhatsApp Web doesn't need for sending: GPU compositing, extensions, sync,
+    background update/metrics traffic, audio and notification prompts. block_images also skips
+    avatars and media; only pass it for a profile that is already logged in, since a new one has
+    to show the QR code.
+    """
+    for arg in ('--disable-gpu', '--disable-extensions', '--disable-background-networking',
+                '--disable-sync', '--metrics-recording-only', '--mute-audio', '--window-size=1280,720'):
+        chrome_options.add_argument(arg)
+    prefs = {'profile.default_content_setting_values.notifications': 2}
+    if block_images:
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        prefs['profile.managed_default_content_settings.images'] = 2
+    chrome_options.add_experimental_option('prefs', prefs)
+
+# Chrome's per-process lock files and disposable caches; the login itself lives in IndexedDB/Local Storage
+_PROFILE_COPY_IGNORE = shutil.ignore_patterns(
+    'SingletonLock', 'SingletonSocket', 'SingletonCookie', 'lockfile',
+    'Cache', 'Code Cache', 'GPUCache', 'ShaderCache', 'Crashpad',
+)
+
+def clone_profile(master):
+    """
+    Copy a logged-in Chrome user data dir to a new temporary dir and return its path. Chrome won't
+    open a profile another Chrome is using, so this lets a second browser (a test run beside the
+    worker, parallel workers) reuse the master's WhatsApp login without a QR scan.
+    """
+    dst = os.path.join(tempfile.mkdtemp(prefix='wa_profile_'), 'profile')
+    shutil.copytree(master, dst, ignore=_PROFILE_COPY_IGNORE, symlinks=True)
+    return dst
 
 class WhatsAppSender:
-    def __init__(self, user_data_dir=None):
+    # Human-like pauses, as (min, max) seconds for random.uniform; override on an instance
+    # (e.g. (0, 0) in a test run) to skip them
+    pre_click_delay = (2.0, 4.5)
+    # Pause between messages of one send_batch call
+    batch_delay = (5, 15)
+
+    # Every known send-button variant in one CSS selector, so a single wait covers them all
+    _SEND_SELECTOR = (
+        By.CSS_SELECTOR,
+        'button[aria-label="Send"], span[data-icon="send"], div[class*="_4sWnG"] button',
+    )
+
+    _COMPOSE_SELECTOR = (By.CSS_SELECTOR, 'footer div[contenteditable="true"]')
+    # The chat list only renders once logged in; the QR code canvas is shown instead otherwise
+    _CHAT_LIST_SELECTOR = (By.CSS_SELECTOR, '#pane-side')
+    _QR_OR_CHAT_LIST_SELECTOR = (By.CSS_SELECTOR, 'canvas[aria-label="Scan me!"], #pane-side')
+
+    def __init__(self, user_data_dir=None, driver=None, copy_profile=False, debugger_address=None):
         """
         Initializes the WhatsAppSender.
         :param user_data_dir: Path to the Chrome user data directory for persistent sessions.
+        :param driver: Already-created WebDriver to use instead of launching Chrome
+                       (e.g. a mock in tests); user_data_dir is ignored when given.
+        :param copy_profile: Run Chrome on a throwaway copy of user_data_dir (see clone_profile),
+                             removed again by close().
+        :param debugger_address: host:port to keep one Chrome across runs: attach to the Chrome
+                                 listening there, or start one with remote debugging on that port.
+                                 close() then leaves it running, logged in, for the next run.
         """
+        self.debugger_address = debugger_address
+        # True when reusing a Chrome started by an earlier run
+        self._attached = False
+        if driver is None and debugger_address:
+            driver = self._attach_chrome(debugger_address)
+        if driver is None:
+            if copy_profile and user_data_dir:
+                user_data_dir = clone_profile(user_data_dir)
+                self.temp_dir = os.path.dirname(user_data_dir)
+                print(f"Copied Chrome profile to: {user_data_dir}")
+            driver = self._start_chrome(user_data_dir)
+        self.driver = driver
+        # Number whose chat is open after the last successful send
+        self._current_chat = None
+        self.wait = WebDriverWait(self.driver, 60) # Increased wait time
+        # The chat box is already loaded when the send button is looked up, so it gets a short budget
+        self.send_wait = WebDriverWait(self.driver, 15)
+        # Upper bound on waiting for the sent tick after clicking send
+        self.sent_wait = WebDriverWait(self.driver, 10)
+        
+        # Initialize WhatsApp Web
+        self._initialize_whatsapp()
+
+    def _attach_chrome(self, debugger_address):
+        """Driver for the Chrome already listening on debugger_address, or None if there is none"""
+        host, _, port = debugger_address.rpartition(':')
+        try:
+            # Cheap probe first: chromedriver takes far longer to give up on a closed port
+            socket.create_connection((host or '127.0.0.1', int(port)), timeout=1).close()
+        except (OSError, ValueError):
+            return None
+        chrome_options = Options()
+        chrome_options.add_experimental_option('debuggerAddress', debugger_address)
+        print(f"🔌 Attaching to running Chrome at {debugger_address}...")
+        try:
+            driver = webdriver.Chrome(service=Service(chromedriver_path()), options=chrome_options)
+        except WebDriverException as e:
+            print(f"⚠️ Could not attach to Chrome at {debugger_address}: {e}")
+            return None
+        self._attached = True
+        return driver
+
+    def _start_chrome(self, user_data_dir):
+        """Launch Chrome with the given (or a temporary) profile and return its driver"""
         chrome_options = Options()
         
         # Add Chrome options for better compatibility
@@ -25,6 +208,12 @@ class WhatsAppSender:
         chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
+        # An existing profile is normally logged in already, so it won't need images for the QR code
+        add_lean_options(chrome_options, block_images=bool(user_data_dir) and os.path.isdir(user_data_dir))
+        if self.debugger_address:
+            # Let later runs attach, and keep Chrome alive once chromedriver stops
+            chrome_options.add_argument(f"--remote-debugging-port={self.debugger_address.rpartition(':')[2]}")
+            chrome_options.add_experimental_option('detach', True)
         
         if user_data_dir:
             # Ensure the user data directory exists
@@ -41,14 +230,13 @@ class WhatsAppSender:
 
         # Use webdriver-manager to handle chromedriver
         try:
-            from webdriver_manager.chrome import ChromeDriverManager
-            service = Service(ChromeDriverManager().install())
+            service = Service(chromedriver_path())
         except ImportError:
             raise ImportError("webdriver-manager is not installed. Please install it with 'pip install webdriver-manager'")
 
         print("🚀 Starting Chrome browser...")
         try:
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
+            driver = webdriver.Chrome(service=service, options=chrome_options)
         except Exception as e:
             error_msg = str(e)
             print(f"❌ Chrome startup failed: {error_msg}")
@@ -70,26 +258,35 @@ class WhatsAppSender:
                 print(f"   - Chrome user data directory doesn't exist: {user_data_dir}")
             raise Exception(f"Failed to start Chrome: {e}")
 
-        self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        self.wait = WebDriverWait(self.driver, 60) # Increased wait time
-        
-        # Initialize WhatsApp Web
-        self._initialize_whatsapp()
+        # Registered once for every page Chrome loads; execute_script only patched the start page,
+        # which the first navigation to WhatsApp Web threw away
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+            'source': "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})",
+        })
+        return driver
 
     def _initialize_whatsapp(self):
         """Initialize WhatsApp Web and wait for login"""
         print("🌐 Loading WhatsApp Web...")
         try:
-            self.driver.get("https://web.whatsapp.com")
-            print("📱 Please scan QR code if not already logged in...")
+            # A reused Chrome normally still has WhatsApp Web open; reloading it would cost the full start-up
+            if not (self._attached and "web.whatsapp.com" in self.driver.current_url):
+                self.driver.get("https://web.whatsapp.com")
             
             # Wait for WhatsApp to load (either QR code or chat interface)
             self.wait.until(
                 lambda driver: "web.whatsapp.com" in driver.current_url
             )
             
-            # Wait a bit more for the interface to fully load
-            time.sleep(random.uniform(2, 5))
+            # A logged-in profile shows the chat list as soon as it is ready, so don't sleep a fixed time
+            try:
+                WebDriverWait(self.driver, 15).until(EC.presence_of_element_located(self._CHAT_LIST_SELECTOR))
+            except TimeoutException:
+                print("📱 Please scan QR code if not already logged in...")
+                try:
+                    self.wait.until(EC.presence_of_element_located(self._QR_OR_CHAT_LIST_SELECTOR))
+                except TimeoutException:
+                    print("⚠️ Neither the chat list nor a QR code appeared; continuing anyway")
             print("✅ WhatsApp Web loaded successfully")
             
         except TimeoutException:
@@ -107,14 +304,14 @@ class WhatsAppSender:
             print(f"📤 Sending message to {phone_number}...")
             
             # URL encode the message
-            import urllib.parse
-            encoded_message = urllib.parse.quote(message)
+            encoded_message = quote(message)
             
             # Clean phone number (remove + if present for URL)
             clean_number = phone_number.replace('+', '')
             url = f"https://web.whatsapp.com/send?phone={clean_number}&text={encoded_message}"
             
             print(f"🔗 Navigating to: {url[:50]}...")
+            self._current_chat = None
             self.driver.get(url)
 
             # Wait for the chat to load and the input field to be ready
@@ -127,40 +324,23 @@ class WhatsAppSender:
             except TimeoutException:
                 return False, "Timed out waiting for chat interface to load."
 
-            # More robust send button selectors
-            send_button_selectors = [
-                '//button[@aria-label="Send"]',
-                '//span[@data-icon="send"]',
-                '//div[contains(@class, "_4sWnG")]//button',
-            ]
-            
-            send_button = None
-            for selector in send_button_selectors:
-                try:
-                    send_button = self.wait.until(
-                        EC.element_to_be_clickable((By.XPATH, selector))
-                    )
-                    print(f"✅ Found send button with selector: {selector}")
-                    break
-                except TimeoutException:
-                    continue
-            
-            if not send_button:
+            try:
+                send_button = self.send_wait.until(EC.element_to_be_clickable(self._SEND_SELECTOR))
+                print("✅ Found send button")
+            except TimeoutException:
                 return False, "Could not find send button"
             
             # Add a random delay before clicking to appear more human-like
-            delay_before = random.uniform(2.0, 4.5)
+            delay_before = random.uniform(*self.pre_click_delay)
             print(f"⏰ Waiting {delay_before:.1f}s before clicking send...")
             time.sleep(delay_before)
             
+            before = outgoing_count(self.driver)
             send_button.click()
             print("✅ Send button clicked")
             
-            # Wait for the message to be sent with random delay
-            delay_after = random.uniform(3, 6)
-            print(f"⏰ Waiting {delay_after:.1f}s for message delivery...")
-            time.sleep(delay_after)
-            return True, "Message sent successfully."
+            self._current_chat = clean_number
+            return self._confirm_sent(before)
 
         except TimeoutException:
             # Check if the error is due to an invalid number
@@ -172,10 +352,76 @@ class WhatsAppSender:
         except Exception as e:
             return False, f"An unexpected error occurred: {e}"
 
+    def send_batch(self, messages, on_result=None):
+        """
+        Sends [(phone_number, message), ...] in order, pausing batch_delay between messages, and
+        returns [(success, result), ...]. A message to the number whose chat is already open is
+        typed straight into it; any other recipient gets the usual send?phone= page load (the
+        sidebar search can't confirm it opened the right chat, so it isn't used to switch).
+        :param on_result: optional callback(index, success, result) run after each message, so
+                          callers can record outcomes as they happen.
+        """
+        results = []
+        for index, (phone_number, message) in enumerate(messages):
+            if index:
+                time.sleep(random.uniform(*self.batch_delay))
+            try:
+                if phone_number.replace('+', '') == self._current_chat:
+                    success, result = self._send_in_open_chat(message)
+                    if not success:
+                        # The open chat went away; load it fresh instead
+                        success, result = self.send_message(phone_number, message)
+                else:
+                    success, result = self.send_message(phone_number, message)
+            except Exception as e:
+                self._current_chat = None
+                success, result = False, f"An unexpected error occurred: {e}"
+            results.append((success, result))
+            if on_result:
+                on_result(index, success, result)
+        return results
+
+    def _send_in_open_chat(self, message):
+        """Type into the open chat and click send, without reloading WhatsApp Web"""
+        print("💬 Reusing open chat...")
+        try:
+            compose = self.driver.find_element(*self._COMPOSE_SELECTOR)
+            compose.click()
+            # Shift+Enter keeps line breaks in the message; a plain Enter would send it early
+            for i, line in enumerate(message.split('\n')):
+                if i:
+                    compose.send_keys(Keys.SHIFT, Keys.ENTER)
+                compose.send_keys(line)
+            send_button = self.send_wait.until(EC.element_to_be_clickable(self._SEND_SELECTOR))
+            time.sleep(random.uniform(*self.pre_click_delay))
+            before = outgoing_count(self.driver)
+            send_button.click()
+        except (NoSuchElementException, TimeoutException, WebDriverException) as e:
+            # Nothing was sent, so the caller can safely fall back to a fresh chat load
+            self._current_chat = None
+            return False, f"Open chat not usable: {e}"
+        # Past the click the message counts as sent; a failure now must not trigger a resend
+        return self._confirm_sent(before)
+
+    def _confirm_sent(self, outgoing_before):
+        """Wait for the sent tick on the message just sent; the click already happened, so
+        a missing tick is reported but still counts as sent (retrying could send it twice)"""
+        print("⏳ Waiting for the sent tick...")
+        if wait_until_sent(self.sent_wait, outgoing_before):
+            print("✅ Sent tick shown")
+            return True, "Message sent successfully."
+        print("⚠️ No sent tick yet; the message may still be queued in WhatsApp Web")
+        return True, "Message sent (no sent tick seen yet)."
+
     def close(self):
         """
         Closes the browser.
         """
+        if self.debugger_address:
+            # Only stop chromedriver; Chrome and its profile stay up for the next run to attach to
+            self.driver.service.stop()
+            print(f"Left Chrome running at {self.debugger_address}")
+            return
         self.driver.quit()
         if hasattr(self, 'temp_dir'):
             shutil.rmtree(self.temp_dir)
@@ -13,8 +13,10 @@ import os
 import time
 import random
 import logging
+from urllib.parse import quote
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
@@ -25,12 +27,86 @@ from selenium.common.exceptions import (
     WebDriverException,
     ElementNotInteractableException
 )
+from whatsapp_sender import add_lean_options, chromedriver_path, outgoing_count, wait_until_sent
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class WhatsAppSenderEnhanced:
+    # Human-like pauses, as (min, max) seconds for random.uniform; override on an instance
+    # (e.g. (0, 0) in a test run) to skip them
+    chat_load_delay = (1, 3)
+    pre_click_delay = (0.5, 1.5)
+
+    # Every known send-button variant in one CSS selector, so a single wait covers them all
+    _SEND_SELECTOR = (
+        By.CSS_SELECTOR,
+        ', '.join([
+            '[data-testid="send"]',
+            'button[aria-label="Send"]',
+            'span[data-icon="send"]',
+            'div[class*="_4sWnG"] button',
+            'button[class*="send"]',
+            '.send-button',
+            '[role="button"][data-tab="11"]',
+        ]),
+    )
+
+    # Login-state markers, each a single grouped selector so one lookup covers every variant
+    _QR_SELECTOR = ', '.join([
+        '[data-ref="qr-code"]',
+        'canvas[aria-label="Scan me!"]',
+        '.landing-main canvas',
+        '._2EZ_m canvas',
+    ])
+    _CHAT_SELECTOR = ', '.join([
+        '[data-testid="chat-list"]',
+        '._3OgTahIITgn2QM6ZPdp2VL',
+        '.app-wrapper-web',
+        '#main',
+    ])
+    _LOADING_SELECTOR = ', '.join([
+        '.landing-main .spinner',
+        '._3q4NP._2yeJ5',
+        '[data-testid="progress-update"]',
+    ])
+    # Classifies the page in one script call: the first of the QR / chat / loading selectors
+    # (arguments 0-2) with a rendered match wins, in that order
+    _LOGIN_STATE_CLASSIFIER_JS = """
+        const [qr, chat, loading] = arguments;
+        const shown = sel => Array.from(document.querySelectorAll(sel)).some(el => el.getClientRects().length > 0);
+        const state = () => shown(qr) ? 'qr_code' : shown(chat) ? 'logged_in' : shown(loading) ? 'loading' : 'unknown';
+    """
+    _LOGIN_STATE_JS = _LOGIN_STATE_CLASSIFIER_JS + "return state();"
+    # Async variant: re-classifies on every DOM mutation and calls back (last argument) with the
+    # first status not in arguments[3], or null once arguments[4] ms pass without one
+    _LOGIN_STATE_CHANGE_JS = _LOGIN_STATE_CLASSIFIER_JS + """
+        const leaving = arguments[3], done = arguments[arguments.length - 1];
+        let observer, timer;
+        const check = () => {
+            const current = state();
+            if (leaving.includes(current)) return false;
+            if (observer) observer.disconnect();
+            clearTimeout(timer);
+            done(current);
+            return true;
+        };
+        if (!check()) {
+            observer = new MutationObserver(check);
+            observer.observe(document.documentElement, {subtree: true, childList: true, attributes: true});
+            timer = setTimeout(() => { observer.disconnect(); done(null); }, arguments[4]);
+        }
+    """
+    # Sent-message markers (ticks, outgoing bubble) for the fallback check in _verify_message_sent
+    _SENT_INDICATOR_SELECTOR = ', '.join([
+        '[data-icon="msg-check"]',  # Single tick
+        '[data-icon="msg-dblcheck"]',  # Double tick
+        '.message-out',
+        '._1i_wG ._3zb-j',
+        '[data-testid="tail-out"]',
+    ])
+
     def __init__(self, user_data_dir=None, headless=True, max_retries=3):
         """
         Enhanced WhatsApp sender with better session management
@@ -41,6 +117,9 @@ class WhatsAppSenderEnhanced:
         self.driver = None
         self.wait = None
         self.session_healthy = False
+        # Number whose chat is open from the last successful send; another message to it is typed
+        # into the open chat instead of reloading WhatsApp Web
+        self._current_chat = None
         
         # Initialize Chrome
         self._setup_chrome()
@@ -66,7 +145,6 @@ class WhatsAppSenderEnhanced:
             chrome_options.add_argument('--headless')
         chrome_options.add_argument('--no-sandbox')
         chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
         chrome_options.add_argument('--disable-web-security')
         chrome_options.add_argument('--disable-features=VizDisplayCompositor')
         
@@ -80,6 +158,8 @@ class WhatsAppSenderEnhanced:
         # Memory and performance
         chrome_options.add_argument('--memory-pressure-off')
         chrome_options.add_argument('--max_old_space_size=4096')
+        # An existing profile is normally logged in already, so it won't need images for the QR code
+        add_lean_options(chrome_options, block_images=bool(self.user_data_dir) and os.path.isdir(self.user_data_dir))
         
         # User agent to appear more like a real browser
         chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0.0.0 Safari/537.36')
@@ -94,8 +174,7 @@ class WhatsAppSenderEnhanced:
         
         # Use webdriver-manager for Chrome
         try:
-            from webdriver_manager.chrome import ChromeDriverManager
-            service = Service(ChromeDriverManager().install())
+            service = Service(chromedriver_path())
         except ImportError:
             raise ImportError("webdriver-manager required: pip install webdriver-manager")
 
@@ -103,14 +182,20 @@ class WhatsAppSenderEnhanced:
             logger.info("🚀 Starting Chrome browser...")
             self.driver = webdriver.Chrome(service=service, options=chrome_options)
             
-            # Anti-detection script
-            self.driver.execute_script("""
+            # Anti-detection script, registered once for every page Chrome loads (execute_script only
+            # patched the start page, which the first navigation to WhatsApp Web threw away)
+            self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': """
                 Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
                 Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
                 Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']});
-            """)
+            """})
             
             self.wait = WebDriverWait(self.driver, 60)
+            # The chat is already loaded when the send button is looked up, so it gets a short budget;
+            # send_message's retry loop owns the overall timeout
+            self.send_wait = WebDriverWait(self.driver, 15)
+            # Upper bound on waiting for the sent tick after clicking send
+            self.sent_wait = WebDriverWait(self.driver, 10)
             logger.info("✅ Chrome browser started successfully")
             
         except Exception as e:
@@ -120,6 +205,7 @@ class WhatsAppSenderEnhanced:
     def _initialize_whatsapp(self):
         """Initialize WhatsApp Web with smart login detection"""
         logger.info("🌐 Loading WhatsApp Web...")
+        self._current_chat = None
         
         try:
             self.driver.get("https://web.whatsapp.com")
@@ -153,62 +239,49 @@ class WhatsAppSenderEnhanced:
     def _check_login_status(self):
         """Determine current login status"""
         try:
-            # Wait a moment for page elements to load
-            time.sleep(3)
-            
-            # Check for QR code (not logged in)
-            qr_selectors = [
-                '[data-ref="qr-code"]',
-                'canvas[aria-label="Scan me!"]',
-                '.landing-main canvas',
-                '._2EZ_m canvas'
-            ]
-            
-            for selector in qr_selectors:
-                try:
-                    qr_element = self.driver.find_element(By.CSS_SELECTOR, selector)
-                    if qr_element.is_displayed():
-                        return "qr_code"
-                except NoSuchElementException:
-                    continue
-            
-            # Check for chat interface (logged in)
-            chat_selectors = [
-                '[data-testid="chat-list"]',
-                '._3OgTahIITgn2QM6ZPdp2VL',
-                '.app-wrapper-web',
-                '#main'
-            ]
-            
-            for selector in chat_selectors:
-                try:
-                    chat_element = self.driver.find_element(By.CSS_SELECTOR, selector)
-                    if chat_element.is_displayed():
-                        return "logged_in"
-                except NoSuchElementException:
-                    continue
-            
-            # Check for loading indicators
-            loading_selectors = [
-                '.landing-main .spinner',
-                '._3q4NP._2yeJ5',
-                '[data-testid="progress-update"]'
-            ]
-            
-            for selector in loading_selectors:
-                try:
-                    loading_element = self.driver.find_element(By.CSS_SELECTOR, selector)
-                    if loading_element.is_displayed():
-                        return "loading"
-                except NoSuchElementException:
-                    continue
-                    
-            return "unknown"
+            # Give page elements up to 3s to settle, but return as soon as the page is classified
+            return self._wait_for_login_state(3, leaving=("loading", "unknown")) or self._login_state()
             
         except Exception as e:
             logger.error(f"Error checking login status: {e}")
             return "unknown"
 
+    def _login_state(self):
+        """Current login status ("qr_code", "logged_in", "loading" or "unknown") in one browser round trip"""
+        # QR code means not logged in; the chat interface means logged in
+        return self.driver.execute_script(
+            self._LOGIN_STATE_JS, self._QR_SELECTOR, self._CHAT_SELECTOR, self._LOADING_SELECTOR
+        ) or "unknown"
+
+    def _wait_for_login_state(self, timeout, leaving):
+        """
+        Wait until the login status is none of `leaving` and return the new status, or None
+        if it is still one of them after `timeout` seconds
+        """
+        deadline = time.time() + timeout
+        try:
+            # One call that returns when a DOM change moves the page out of `leaving`
+            self.driver.set_script_timeout(timeout + 5)
+            return self.driver.execute_async_script(
+                self._LOGIN_STATE_CHANGE_JS, self._QR_SELECTOR, self._CHAT_SELECTOR,
+                self._LOADING_SELECTOR, list(leaving), int(timeout * 1000),
+            )
+        except WebDriverException as e:
+            # A navigation (e.g. WhatsApp reloading after a QR scan) aborts the script; poll the rest
+            logger.debug(f"Login state observer interrupted, polling instead: {e}")
+        
+        def left(driver):
+            try:
+                status = self._login_state()
+            except WebDriverException:
+                return False
+            return status not in leaving and status
+        
+        try:
+            return WebDriverWait(self.driver, max(deadline - time.time(), 0), poll_frequency=0.5).until(left)
+        except TimeoutException:
+            return None
+
     def _handle_qr_code(self):
         """Handle QR code scanning with timeout"""
         logger.info("📱 Waiting for QR code to be scanned...")
@@ -217,15 +290,11 @@ class WhatsAppSenderEnhanced:
         # Instead, we'll wait a reasonable time and then give up
         max_qr_wait = int(os.environ.get('QR_WAIT_TIMEOUT', '120'))  # 2 minutes default
         
-        start_time = time.time()
-        while time.time() - start_time < max_qr_wait:
-            time.sleep(5)
-            status = self._check_login_status()
-            if status == "logged_in":
-                logger.info("✅ QR code scanned successfully")
-                return
-            elif status != "qr_code":
-                break
+        # Returns as soon as the QR code is gone, waiting through the loading screen that follows a scan
+        status = self._wait_for_login_state(max_qr_wait, leaving=("qr_code", "loading"))
+        if status == "logged_in":
+            logger.info("✅ QR code scanned successfully")
+            return
                 
         # If we get here, QR code wasn't scanned in time
         if self._check_login_status() != "logged_in":
@@ -238,17 +307,13 @@ class WhatsAppSenderEnhanced:
         logger.info("⏳ Waiting for WhatsApp to finish loading...")
         
         max_wait = 60
-        start_time = time.time()
-        
-        while time.time() - start_time < max_wait:
-            time.sleep(2)
-            status = self._check_login_status()
-            if status == "logged_in":
-                logger.info("✅ WhatsApp loaded successfully")
-                return
-            elif status == "qr_code":
-                self._handle_qr_code()
-                return
+        status = self._wait_for_login_state(max_wait, leaving=("loading", "unknown"))
+        if status == "logged_in":
+            logger.info("✅ WhatsApp loaded successfully")
+            return
+        elif status == "qr_code":
+            self._handle_qr_code()
+            return
                 
         logger.warning("⚠️ WhatsApp took longer than expected to load")
 
@@ -279,6 +344,7 @@ class WhatsAppSenderEnhanced:
         """Attempt to recover an unhealthy session"""
         logger.info("🔄 Attempting session recovery...")
         
+        self._current_chat = None
         try:
             # Refresh the page
             self.driver.refresh()
@@ -316,18 +382,22 @@ class WhatsAppSenderEnhanced:
                 logger.info(f"📤 Sending message to {phone_number} (attempt {attempt + 1})")
                 
                 # URL encode the message
-                import urllib.parse
-                encoded_message = urllib.parse.quote(message)
+                encoded_message = quote(message)
                 
                 # Clean phone number for URL
                 clean_number = phone_number.replace('+', '')
-                url = f"https://web.whatsapp.com/send?phone={clean_number}&text={encoded_message}"
-                
-                logger.info(f"🔗 Navigating to chat...")
-                self.driver.get(url)
                 
-                # Wait for chat to load
-                time.sleep(random.uniform(1, 3))  # Reduced from 3-6 to 1-3 seconds
+                # Same recipient as the last send: the chat is still open, so skip the page load
+                if not (attempt == 0 and clean_number == self._current_chat
+                        and self._type_into_open_chat(message)):
+                    self._current_chat = None
+                    url = f"https://web.whatsapp.com/send?phone={clean_number}&text={encoded_message}"
+                    
+                    logger.info(f"🔗 Navigating to chat...")
+                    self.driver.get(url)
+                    
+                    # Wait for chat to load
+                    time.sleep(random.uniform(*self.chat_load_delay))
                 
                 # Enhanced send button detection
                 send_button = self._find_send_button()
@@ -339,11 +409,12 @@ class WhatsAppSenderEnhanced:
                     return False, "Could not find send button after all attempts"
                 
                 # Human-like interaction
-                self._human_like_send(send_button)
+                outgoing_before = self._human_like_send(send_button)
                 
                 # Verify message was sent
-                if self._verify_message_sent():
+                if self._verify_message_sent(outgoing_before):
                     logger.info("✅ Message sent successfully")
+                    self._current_chat = clean_number
                     return True, "Message sent successfully"
                 else:
                     if attempt < self.max_retries - 1:
@@ -353,6 +424,7 @@ class WhatsAppSenderEnhanced:
                     return False, "Message send verification failed"
                     
             except Exception as e:
+                self._current_chat = None
                 logger.error(f"Send attempt {attempt + 1} failed: {e}")
                 if attempt < self.max_retries - 1:
                     time.sleep(10)
@@ -361,55 +433,43 @@ class WhatsAppSenderEnhanced:
         
         return False, "Max retries exceeded"
 
+    def _type_into_open_chat(self, message):
+        """Type the message into the open chat's compose box; False if the box can't be found"""
+        try:
+            compose = self.driver.find_element(By.CSS_SELECTOR, 'footer div[contenteditable="true"]')
+            compose.click()
+            # Shift+Enter keeps line breaks in the message; a plain Enter would send it early
+            for i, line in enumerate(message.split('\n')):
+                if i:
+                    compose.send_keys(Keys.SHIFT, Keys.ENTER)
+                compose.send_keys(line)
+            logger.info("💬 Reusing open chat")
+            return True
+        except (NoSuchElementException, ElementNotInteractableException, WebDriverException) as e:
+            logger.warning(f"Open chat not usable, reloading it: {e}")
+            return False
+
+    def flush_chat(self):
+        """Forget the open chat so the next send loads its chat fresh"""
+        self._current_chat = None
+
     def _find_send_button(self):
-        """Find send button with multiple selectors"""
-        send_button_selectors = [
-            '[data-testid="send"]',
-            'button[aria-label="Send"]',
-            'span[data-icon="send"]',
-            '._4sWnG button',
-            'button[class*="send"]',
-            '.send-button',
-            '[role="button"][data-tab="11"]'
-        ]
-        
-        for selector in send_button_selectors:
-            try:
-                button = self.wait.until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-                )
-                logger.info(f"✅ Found send button: {selector}")
-                return button
-            except TimeoutException:
-                continue
-                
-        # Try XPath selectors
-        xpath_selectors = [
-            '//button[@aria-label="Send"]',
-            '//span[@data-icon="send"]',
-            '//button[contains(@class, "send")]',
-            '//div[contains(@class, "_4sWnG")]//button'
-        ]
-        
-        for selector in xpath_selectors:
-            try:
-                button = self.wait.until(
-                    EC.element_to_be_clickable((By.XPATH, selector))
-                )
-                logger.info(f"✅ Found send button with XPath: {selector}")
-                return button
-            except TimeoutException:
-                continue
-                
-        return None
+        """Find the send button (any known variant) with one short wait"""
+        try:
+            button = self.send_wait.until(EC.element_to_be_clickable(self._SEND_SELECTOR))
+            logger.info("✅ Found send button")
+            return button
+        except TimeoutException:
+            return None
 
     def _human_like_send(self, send_button):
-        """Send message with human-like behavior"""
+        """Send message with human-like behavior; returns the outgoing message count before the click"""
         # Random delay before clicking
-        delay = random.uniform(0.5, 1.5)  # Reduced from 1.5-3.5 to 0.5-1.5 seconds
+        delay = random.uniform(*self.pre_click_delay)
         logger.info(f"⏰ Waiting {delay:.1f}s before sending...")
         time.sleep(delay)
         
+        outgoing_before = outgoing_count(self.driver)
         # Click with potential retry
         try:
             send_button.click()
@@ -420,29 +480,19 @@ class WhatsAppSenderEnhanced:
             time.sleep(1)
             send_button.click()
             logger.info("✅ Send button clicked after scroll")
-        
-        # Wait for message to be processed
-        time.sleep(random.uniform(1, 2))  # Reduced from 2-4 to 1-2 seconds
+        return outgoing_before
 
-    def _verify_message_sent(self):
+    def _verify_message_sent(self, outgoing_before):
         """Verify that the message was actually sent"""
+        # Returns as soon as the new message shows its tick, rather than after a fixed pause
+        if wait_until_sent(self.sent_wait, outgoing_before):
+            logger.info("✅ Message sent tick seen")
+            return True
         try:
             # Look for sent message indicators
-            sent_indicators = [
-                '[data-icon="msg-check"]',  # Single tick
-                '[data-icon="msg-dblcheck"]',  # Double tick
-                '.message-out',
-                '._1i_wG ._3zb-j',
-                '[data-testid="tail-out"]'
-            ]
-            
-            for indicator in sent_indicators:
-                try:
-                    self.driver.find_element(By.CSS_SELECTOR, indicator)
-                    logger.info(f"✅ Message sent indicator found: {indicator}")
-                    return True
-                except NoSuchElementException:
-                    continue
+            if self.driver.find_elements(By.CSS_SELECTOR, self._SENT_INDICATOR_SELECTOR):
+                logger.info("✅ Message sent indicator found")
+                return True
                     
             # If no specific indicators found, assume success if no error
             return True
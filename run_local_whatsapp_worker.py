@@ -6,7 +6,6 @@ Run this on your local machine while the web app runs on Railway
 import os
 import sys
 import time
-import requests
 from dotenv import load_dotenv
 
 # Add project directories to Python path
@@ -36,15 +35,21 @@ def main():
         print("Make sure your .env file is configured properly")
         return 1
     
-    # Test API connection first
+    # The sender module reads its configuration from the environment loaded above
+    try:
+        from lms_automation import send_all_queued_messages
+    except Exception as e:
+        print(f"❌ WhatsApp sender failed: {e}")
+        return 1
+    
+    # Test API connection first, on the sender's keep-alive session so its own fetch reuses the connection.
+    # Probe /api/health: a GET of /api/queue/all_pending would claim every job before the sender runs
     print("\n🔗 Testing API connection...")
     try:
-        headers = {"Authorization": f"Bearer {WORKER_API_TOKEN}"}
-        response = requests.get(f"{BASE_URL}/api/queue/all_pending", headers=headers, timeout=10)
+        response = send_all_queued_messages.session.get(send_all_queued_messages.URL_HEALTH, timeout=10)
         
         if response.status_code == 200:
-            pending_count = len(response.json())
-            print(f"✅ API connection successful - {pending_count} pending messages")
+            print("✅ API connection successful")
         else:
             print(f"❌ API error: HTTP {response.status_code}")
             return 1
@@ -57,8 +62,7 @@ def main():
     # Start the WhatsApp sender
     print("\n📱 Starting WhatsApp sender...")
     try:
-        from lms_automation.send_all_queued_messages import main as sender_main
-        sender_main()
+        send_all_queued_messages.main()
         print("✅ WhatsApp sending completed!")
         return 0
         
@@ -23,9 +23,9 @@ if [ ! -x "$PYTHON" ]; then
   "$PYTHON" -m pip install -r lms_automation/requirements.txt
 fi
 
-# Load env
+# Load env (and tell the Python side where it is)
 set -a
-[ -f .env ] && source .env
+[ -f .env ] && source .env && DOTENV_PATH="$PWD/.env"
 set +a
 
 echo "🚀 Starting manual sender with $PYTHON"
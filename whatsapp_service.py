@@ -29,7 +29,36 @@ class WhatsAppService:
         self.running = True
         self.sender = None
         self.stats = {'sent': 0, 'failed': 0, 'started': datetime.now()}
+        self._http = None
+        # Read once; the service polls these endpoints for as long as it runs
+        self.base_url = os.environ.get('BASE_URL')
+        self.token = os.environ.get('WORKER_API_TOKEN')
+        self.headers = {"Authorization": f"Bearer {self.token}"}
         
+    @property
+    def http(self):
+        """
+        Keep-alive session reused for every poll and status report. Only POSTs are retried:
+        a GET of /api/queue/next claims jobs, so repeating one whose claim already committed
+        would leave the first batch stuck in_progress
+        """
+        if self._http is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            self._http = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=2, pool_maxsize=4,
+                max_retries=Retry(
+                    total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+                    allowed_methods=frozenset({"POST"}),
+                ),
+            )
+            self._http.mount("http://", adapter)
+            self._http.mount("https://", adapter)
+        return self._http
+
     def log(self, message):
         """Log with timestamp"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -68,19 +97,13 @@ class WhatsAppService:
     
     def get_pending_jobs(self):
         """Get jobs from Railway database"""
-        import requests
-        
-        base_url = os.environ.get('BASE_URL')
-        token = os.environ.get('WORKER_API_TOKEN')
-        
-        if not base_url or not token:
+        if not self.base_url or not self.token:
             self.log("❌ Missing BASE_URL or WORKER_API_TOKEN")
             return []
         
         try:
-            headers = {"Authorization": f"Bearer {token}"}
-            response = requests.get(f"{base_url}/api/queue/next?limit=10", 
-                                  headers=headers, timeout=15)
+            response = self.http.get(f"{self.base_url}/api/queue/next", params={"limit": 10},
+                                     headers=self.headers, timeout=15)
             
             if response.status_code == 200:
                 jobs = response.json()
@@ -97,19 +120,13 @@ class WhatsAppService:
     
     def mark_job_status(self, job_id, status, error=None):
         """Report job status back to Railway"""
-        import requests
-        
-        base_url = os.environ.get('BASE_URL')
-        token = os.environ.get('WORKER_API_TOKEN')
-        
-        headers = {"Authorization": f"Bearer {token}"}
         payload = {"id": job_id, "status": status}
         if error:
             payload["error"] = str(error)
         
         try:
-            response = requests.post(f"{base_url}/api/queue/mark", 
-                                   headers=headers, json=payload, timeout=15)
+            response = self.http.post(f"{self.base_url}/api/queue/mark",
+                                      headers=self.headers, json=payload, timeout=15)
             return response.status_code == 200
         except:
             return False